@@ -1,61 +1,59 @@
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
 from streamlit.logger import get_logger
 
+from charts import draw_year_months, render_chart
+from cube import cube_group, slice_cube
+from kpi import productivity_labels
+from pipeline import (Pipeline, run_load_stages, select_duration_unit, session_profile, show_pipeline_report,
+                      show_profile_panel, start_profile_panel, upload_workbooks)
+
 def run():
     # Set page config
     st.set_page_config(page_title="Análisis de Proyectos", page_icon="📊")
 
-    # Upload the Excel file
-    uploaded_file = st.file_uploader("Carga tu archivo Excel", type=["xlsx"])
-
-    if uploaded_file is not None:
-        data = pd.read_excel(uploaded_file)
-
-        # Define the date columns
-        date_columns = ['FechaCartaConsulta', 'FechaAprobacion', 'FechaVigencia', 'FechaElegibilidad', 'FechaPrimeDesembolso']
-        # Convert the columns to datetime format (if they aren't already)
-        for col in date_columns:
-            data[col] = pd.to_datetime(data[col], errors='coerce')
+    # Opt-in per-rerun timing breakdown in the sidebar
+    start_profile_panel()
 
-        # Calculate the difference in months between the specified columns
-        for i in range(len(date_columns) - 1):
-            start_col = date_columns[i]
-            end_col = date_columns[i + 1]
-            diff_col_name = 'Meses_' + start_col[5:] + '_' + end_col[5:]
-            data[diff_col_name] = ((data[end_col] - data[start_col]).dt.days / 30).clip(lower=0)
+    # Workbooks of the session (uploaded on this page or on another one)
+    workbooks = upload_workbooks()
 
-        # Extract year from each date column and create new columns with year information
-        for col in date_columns:
-            data['AÑO' + col[5:]] = data[col].dt.year
+    if workbooks:
+        # Load the workbook and build the long KPI table and the aggregate cube
+        # (year, country, station, productivity). These are session stages shared
+        # with the other pages: if another page already built them they are reused
+        pipeline = Pipeline('inicio')
+        _, cube = run_load_stages(pipeline, workbooks, profile=session_profile(), unit=select_duration_unit())
 
         # App title and description
         st.title("Análisis de Proyectos")
         st.write("Análisis de la duración en meses entre diferentes etapas de los proyectos.")
 
         # User input for country selection
-        country = st.selectbox("Selecciona un país:", data['PAIS'].unique())
+        country = st.selectbox("Selecciona un país:", list(cube['PAIS'].dropna().unique()))
 
         # User input for analysis type
         analysis_type = st.selectbox("Selecciona el tipo de análisis:", ["CartaConsulta-Aprobación", "Aprobación-Vigencia", "Vigencia-Elegibilidad", "Elegibilidad-PrimeDesembolso"])
-        # Determine the column for analysis based on the user's selection
+        # Determine the columns and the cube station for the analysis based on the user's selection
         column_mapping = {
-            "CartaConsulta-Aprobación": ('Meses_CartaConsulta_Aprobacion', 'AÑOAprobacion'),
-            "Aprobación-Vigencia": ('Meses_Aprobacion_Vigencia', 'AÑOVigencia'),
-            "Vigencia-Elegibilidad": ('Meses_Vigencia_Elegibilidad', 'AÑOElegibilidad'),
-            "Elegibilidad-PrimeDesembolso": ('Meses_Elegibilidad_PrimeDesembolso', 'AÑOPrimeDesembolso')
+            "CartaConsulta-Aprobación": ('Meses_CartaConsulta_Aprobacion', 'AÑOAprobacion', 'Aprobacion'),
+            "Aprobación-Vigencia": ('Meses_Aprobacion_Vigencia', 'AÑOVigencia', 'Vigencia'),
+            "Vigencia-Elegibilidad": ('Meses_Vigencia_Elegibilidad', 'AÑOElegibilidad', 'Elegibilidad'),
+            "Elegibilidad-PrimeDesembolso": ('Meses_Elegibilidad_PrimeDesembolso', 'AÑOPrimeDesembolso', 'PrimerDesembolso')
         }
-        month_column, year_column = column_mapping[analysis_type]
+        month_column, year_column, station = column_mapping[analysis_type]
 
-        # Filter data by country and ensure that the months are non-negative
-        filtered_data = data[(data['PAIS'] == country) & (data[month_column] >= 0)]
+        # Select the cube cells for the country and station where the months are known
+        filtered_cells = slice_cube(cube, countries=[country], stations=[station], productivity=productivity_labels)
 
-        # Group by the appropriate year column and calculate the mean of the selected column
-        grouped = filtered_data.groupby(year_column)[month_column].mean().reset_index()
+        # Group by year and calculate the mean (rounded to two decimal places) and count of the months
+        by_year = cube_group(filtered_cells, 'ANO', measure='meses', decimals=2)
 
-        # Round the months to two decimal places
-        grouped[month_column] = grouped[month_column].round(2)
+        # Yearly means as a table
+        grouped = pd.DataFrame({
+            year_column: by_year.index,
+            month_column: by_year['promedio'].to_numpy()
+        })
 
         # Display metrics
         promedio_meses = grouped[month_column].mean()
@@ -66,23 +64,16 @@ def run():
         with col2:
             st.metric(label="Total de Proyectos", value=total_operaciones)
         
-        # Plotting
-        fig, ax = plt.subplots(figsize=(10, 6))
-        grouped.plot(kind='bar', x=year_column, y=month_column, ax=ax, color='lightblue', legend=False)
-        ax.set_ylabel('Meses')
-        ax.set_xlabel('Año')
-        ax.set_title(f'{analysis_type} - {country}')
-        for bar in ax.patches:
-            yval = bar.get_height()
-            ax.text(bar.get_x() + bar.get_width()/2, yval + 0.1, int(round(yval)), ha='center', va='bottom')
-
-        st.pyplot(fig)
-
-        # Group by the appropriate year column and calculate the mean and count of the selected column
-        grouped = filtered_data.groupby(year_column)[month_column].agg(['mean', 'count']).reset_index()
+        # Plotting (rendered once per data and selection, then served from the cache)
+        chart = render_chart(draw_year_months, grouped, year_column, month_column, f'{analysis_type} - {country}')
+        st.image(chart, width='stretch')
 
-        # Round the 'mean' column to two decimal places
-        grouped['mean'] = grouped['mean'].round(2)
+        # Mean and count of the selected column per year
+        grouped = pd.DataFrame({
+            year_column: by_year.index,
+            'mean': by_year['promedio'].to_numpy(),
+            'count': by_year['meses_count'].to_numpy()
+        })
 
         # Rename the columns for clarity
         grouped.columns = [year_column, 'Promedio_Meses', 'Cantidad_Operaciones']
@@ -92,6 +83,8 @@ def run():
         st.dataframe(grouped)
 
         # Optional: Sidebar information or other components can be added here
+        show_pipeline_report(pipeline)
+        show_profile_panel('Hello')
 
 if __name__ == "__main__":
     run()
@@ -0,0 +1,86 @@
+import altair as alt
+
+from charts import country_colors
+from cube import measure_scale
+from kpi import insufficient_label, productivity_labels
+
+
+# Función para preparar los datos que se envían al navegador: el cubo sumado por
+# año, país, estación y productividad (suma de KPI en meses, conteo y filas). Es
+# una tabla pequeña; los filtros y promedios se calculan del lado del cliente.
+def chart_data(cube):
+    cells = cube[cube['ANO'].notna()]
+    grouped = cells.groupby(['ANO', 'PAIS', 'ESTACIONES', 'Productividad'], sort=True)
+    data = grouped[['kpi_sum', 'kpi_count', 'filas']].sum().reset_index()
+    data = data[data['filas'] > 0]
+    data['ANO'] = data['ANO'].astype(int)
+    data['kpi_sum'] = data['kpi_sum'] / measure_scale['kpi']
+    return data
+
+# Escala de colores de los países (gris para los que no están en la paleta)
+def country_scale(countries):
+    domain = list(country_colors) + sorted(set(countries) - set(country_colors))
+    return alt.Scale(domain=domain, range=[country_colors.get(country, "#333333") for country in domain])
+
+
+# Gráficos de la página de eficiencia (promedio por país, conteo por productividad y
+# barras apiladas por año y país) como una sola especificación de Vega-Lite.
+# El rango de años y la estación son parámetros con sus propios controles en el
+# gráfico, y hacer clic en un país de la leyenda lo resalta en los tres gráficos:
+# nada de eso vuelve a ejecutar el script en el servidor.
+def efficiency_chart(data, stations):
+    min_year, max_year = int(data['ANO'].min()), int(data['ANO'].max())
+    year_from = alt.param(name='desde', value=min_year,
+                          bind=alt.binding_range(min=min_year, max=max_year, step=1, name='Desde el año '))
+    year_to = alt.param(name='hasta', value=max_year,
+                        bind=alt.binding_range(min=min_year, max=max_year, step=1, name='Hasta el año '))
+    station = alt.param(name='estacion', value='Todas',
+                        bind=alt.binding_select(options=['Todas'] + list(stations), name='Estación '))
+    highlight = alt.selection_point(fields=['PAIS'], bind='legend')
+    colors = country_scale(data['PAIS'].unique())
+    opacity = alt.condition(highlight, alt.value(1.0), alt.value(0.3))
+
+    base = alt.Chart(data).transform_filter(
+        "datum.ANO >= desde && datum.ANO <= hasta && (estacion == 'Todas' || datum.ESTACIONES == estacion)"
+    )
+
+    # Tiempo de respuesta promedio por país
+    by_country = base.transform_aggregate(
+        kpi_sum='sum(kpi_sum)', kpi_count='sum(kpi_count)', groupby=['PAIS']
+    ).transform_filter('datum.kpi_count > 0').transform_calculate(
+        promedio='datum.kpi_sum / datum.kpi_count'
+    ).mark_bar().encode(
+        x=alt.X('promedio:Q', title='Meses'),
+        y=alt.Y('PAIS:N', sort='x', title=None),
+        color=alt.Color('PAIS:N', scale=colors, legend=None),
+        opacity=opacity,
+        tooltip=[alt.Tooltip('PAIS:N', title='País'), alt.Tooltip('promedio:Q', title='Meses', format='.2f')]
+    ).properties(title="Tiempo de Respuesta Promedio en Meses por País", width=280, height=220)
+
+    # Conteo de estaciones por productividad (sin los datos insuficientes)
+    by_productivity = base.transform_filter(
+        f"datum.Productividad != '{insufficient_label}'"
+    ).transform_aggregate(
+        filas='sum(filas)', groupby=['Productividad']
+    ).mark_bar().encode(
+        x=alt.X('filas:Q', title='Estaciones'),
+        y=alt.Y('Productividad:N', sort='x', title=None),
+        color=alt.Color('Productividad:N', scale=alt.Scale(domain=productivity_labels, scheme='spectral'), legend=None),
+        tooltip=[alt.Tooltip('Productividad:N'), alt.Tooltip('filas:Q', title='Estaciones')]
+    ).properties(title="Eficiencia en Tiempos de Respuesta", width=280, height=220)
+
+    # Tiempo promedio por año y país, apilado
+    by_year = base.transform_aggregate(
+        kpi_sum='sum(kpi_sum)', kpi_count='sum(kpi_count)', groupby=['ANO', 'PAIS']
+    ).transform_filter('datum.kpi_count > 0').transform_calculate(
+        promedio='datum.kpi_sum / datum.kpi_count'
+    ).mark_bar().encode(
+        x=alt.X('ANO:O', title='Año', axis=alt.Axis(labelAngle=0)),
+        y=alt.Y('promedio:Q', stack='zero', title='KPI Promedio'),
+        color=alt.Color('PAIS:N', scale=colors, legend=alt.Legend(title='País')),
+        opacity=opacity,
+        tooltip=[alt.Tooltip('ANO:O', title='Año'), alt.Tooltip('PAIS:N', title='País'),
+                 alt.Tooltip('promedio:Q', title='KPI Promedio', format='.2f')]
+    ).add_params(highlight).properties(title="Tiempo Promedio por Año y País", width=640, height=320)
+
+    return alt.vconcat(alt.hconcat(by_country, by_productivity), by_year).add_params(year_from, year_to, station)
@@ -0,0 +1,130 @@
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from cube import build_cube_workbooks
+from durations import duration_units
+from ingest import normalize_dates, read_workbook
+from productivity import load_profile, profile_path
+from reports import build_reports, cube_reports, report_formats, write_reports
+
+
+# Planillas a procesar: los .xlsx indicados y los que hay dentro de cada
+# directorio (sin los archivos temporales de Excel, '~$...'), sin repetir una
+# planilla indicada dos veces
+def find_workbooks(inputs):
+    workbooks = []
+    for entry in map(Path, inputs):
+        if entry.is_dir():
+            workbooks += sorted(path for path in entry.glob('*.xlsx') if not path.name.startswith('~$'))
+        else:
+            workbooks.append(entry)
+    seen = set()
+    return [workbook for workbook in workbooks
+            if not (workbook.resolve() in seen or seen.add(workbook.resolve()))]
+
+# Subdirectorio de salida de cada planilla: su nombre, o '<directorio>/<nombre>'
+# si otra planilla de otro directorio se llama igual (p. ej. una carpeta por
+# oficina con los mismos nombres de archivo). Si aun así dos planillas caen en
+# el mismo subdirectorio, ValueError: se escribirían los mismos reportes a la vez.
+def output_names(workbooks):
+    stems = Counter(workbook.stem for workbook in workbooks)
+    names = [Path(workbook.stem) if stems[workbook.stem] == 1 else Path(workbook.parent.name) / workbook.stem
+             for workbook in workbooks]
+    repeated = sorted(str(name) for name, count in Counter(names).items() if count > 1)
+    if repeated:
+        raise ValueError(f"varias planillas escribirían en el mismo subdirectorio: {', '.join(repeated)}")
+    return names
+
+# Genera los reportes de una planilla en `output / name` (ver output_names).
+# Se ejecuta en un proceso del pool; devuelve las rutas escritas y el tiempo.
+def process_workbook(workbook, output, name, formats, unit, thresholds):
+    start = time.perf_counter()
+    data = normalize_dates(read_workbook(workbook.read_bytes()))
+    reports = build_reports(data, profile=load_profile(thresholds), unit=unit)
+    paths = write_reports(reports, output / name, formats=formats)
+    return paths, time.perf_counter() - start
+
+# Genera los reportes resumidos del conjunto de planillas en `output / combinado`:
+# cada planilla se agrega por tandas en un proceso y solo se combinan los cubos.
+# Las planillas que no se pueden leer se informan con on_error(planilla, error)
+# y se omiten, como en el modo de un reporte por planilla.
+def process_combined(workbooks, output, formats, unit, thresholds, workers, on_error):
+    start = time.perf_counter()
+    cube = build_cube_workbooks(workbooks, profile=load_profile(thresholds), unit=unit, workers=workers,
+                                on_error=on_error)
+    if cube is None:
+        raise ValueError("las planillas no tienen filas")
+    paths = write_reports(cube_reports(cube), output / 'combinado', formats=formats)
+    return paths, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Genera los reportes de KPI (tabla de resultados, KPI promedio por país y año y "
+                    "resumen de alta demora) para una o varias planillas, sin Streamlit.")
+    parser.add_argument('inputs', nargs='+', help="planillas .xlsx o directorios que las contienen")
+    parser.add_argument('-o', '--output', type=Path, default=Path('reportes'),
+                        help="directorio de salida; cada planilla escribe en un subdirectorio con su nombre "
+                             "(con el de su directorio si hay planillas con el mismo nombre)")
+    parser.add_argument('-f', '--formats', nargs='+', choices=report_formats, default=report_formats)
+    parser.add_argument('-u', '--unit', choices=list(duration_units), default='dias30',
+                        help="unidad de duración de los KPI")
+    parser.add_argument('-t', '--thresholds', type=Path, default=profile_path,
+                        help="archivo con el perfil de umbrales de productividad")
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(),
+                        help="procesos en paralelo (uno por planilla)")
+    parser.add_argument('-c', '--combinar', action='store_true',
+                        help="en lugar de un reporte por planilla, escribir los reportes resumidos del conjunto "
+                             "de planillas (sin la tabla larga) en el subdirectorio 'combinado'")
+    args = parser.parse_args()
+
+    workbooks = find_workbooks(args.inputs)
+    if not workbooks:
+        parser.error("no se encontraron planillas .xlsx")
+    load_profile(args.thresholds)  # Validar el perfil antes de lanzar los procesos
+
+    failures = 0
+
+    if args.combinar:
+        def report_failure(workbook, error):
+            nonlocal failures
+            failures += 1
+            print(f"ERROR {workbook}: {error}", file=sys.stderr)
+
+        try:
+            paths, elapsed = process_combined(workbooks, args.output, args.formats, args.unit, args.thresholds,
+                                              args.workers, report_failure)
+        except Exception as error:
+            print(f"ERROR: {error}", file=sys.stderr)
+            sys.exit(1)
+        print(f"{len(workbooks) - failures} de {len(workbooks)} planillas -> {args.output / 'combinado'} "
+              f"({len(paths)} archivos, {elapsed:.1f} s)")
+        sys.exit(1 if failures else 0)
+
+    try:
+        names = output_names(workbooks)
+    except ValueError as error:
+        parser.error(str(error))
+    with ProcessPoolExecutor(max_workers=min(args.workers, len(workbooks))) as pool:
+        futures = {pool.submit(process_workbook, workbook, args.output, name, args.formats, args.unit, args.thresholds):
+                   (workbook, name) for workbook, name in zip(workbooks, names)}
+        for future in as_completed(futures):
+            workbook, name = futures[future]
+            try:
+                paths, elapsed = future.result()
+            except Exception as error:
+                failures += 1
+                print(f"ERROR {workbook}: {error}", file=sys.stderr)
+            else:
+                print(f"{workbook} -> {args.output / name} ({len(paths)} archivos, {elapsed:.1f} s)")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import argparse
+import calendar
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import make_operations
+from durations import (business_calendar, business_day_table, business_days_per_month, calendar_tables, duration_months,
+                       duration_units)
+from ingest import normalize_dates
+from kpi import operations, repeat_categorical, station_dates
+
+
+# Mejor tiempo de `repeat` ejecuciones
+def best_time(func, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+# Verifica el modo de días hábiles contra np.busday_count fila por fila en una muestra
+def check_business_days(starts, ends, countries, sample=2_000):
+    months = duration_months(starts, ends, unit='habiles', countries=countries)
+    starts = starts.astype('datetime64[D]')
+    ends = ends.astype('datetime64[D]')
+    rows = np.flatnonzero(~(np.isnat(starts) | np.isnat(ends)))[:sample]
+    expected = [np.busday_count(starts[row], ends[row], busdaycal=business_calendar(countries[row], 1990, 2060))
+                for row in rows]
+    np.testing.assert_allclose(months[rows] * business_days_per_month, expected)
+
+# Fecha que resulta de sumar `months` meses a `start`, con el último día del mes
+# si el día no existe en el mes de destino
+def add_months(start, months):
+    year, month = divmod(start.month - 1 + months, 12)
+    year += start.year
+    return date(year, month + 1, min(start.day, calendar.monthrange(year, month + 1)[1]))
+
+# Meses calendario exactos entre dos fechas, fecha por fecha
+def calendar_months(start, end):
+    if end < start:
+        return -calendar_months(end, start)
+    whole = (end.year - start.year) * 12 + end.month - start.month
+    if add_months(start, whole) > end:
+        whole -= 1
+    anchor = add_months(start, whole)
+    return whole + (end - anchor).days / (add_months(start, whole + 1) - anchor).days
+
+# Verifica el modo de meses calendario contra el cálculo fecha por fecha en una
+# muestra, con fines anteriores al inicio y fines de mes
+def check_calendar_months(starts, ends, sample=2_000):
+    starts = np.concatenate([starts[:sample], ends[:sample]]).astype('datetime64[D]')
+    ends = np.concatenate([ends[:sample], starts[:sample] + np.timedelta64(30, 'D')]).astype('datetime64[D]')
+    rows = np.flatnonzero(~(np.isnat(starts) | np.isnat(ends)))
+    months = duration_months(starts[rows], ends[rows], unit='calendario')
+    expected = [calendar_months(start.item(), end.item()) for start, end in zip(starts[rows], ends[rows])]
+    np.testing.assert_allclose(months, expected, rtol=0, atol=1e-12)
+
+# Vacía los cachés de calendarios y tablas de las unidades
+def clear_tables():
+    for cached in (business_calendar, business_day_table, calendar_tables):
+        cached.cache_clear()
+
+
+# Tiempo de cada unidad respecto de la división ingenua días / 30, con las
+# tablas de calendario ya armadas (como en los reruns de la página) y en frío
+# (primera llamada, armando las tablas)
+def main():
+    parser = argparse.ArgumentParser(description="Compara cada unidad de duración con la división ingenua días / 30.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 250_000])
+    args = parser.parse_args()
+
+    units = [unit for unit in duration_units if unit != 'dias30']
+    print(f"{'operaciones':>12} {'días / 30 (s)':>14} {'dias30':>12} "
+          + ' '.join(f"{unit:>12} {'en frío':>9}" for unit in units))
+    for size in args.sizes:
+        data = normalize_dates(make_operations(size))
+        starts, ends = station_dates(data)
+        countries = repeat_categorical(data['PAIS'], len(operations))
+        check_business_days(starts, ends, countries)
+        check_calendar_months(starts, ends)
+
+        naive = best_time(lambda: (pd.Series(ends) - pd.Series(starts)).dt.days.to_numpy(dtype='float64') / 30)
+        columns = [best_time(lambda: duration_months(starts, ends, countries=countries)) / naive]
+        for unit in units:
+            columns.append(best_time(lambda: duration_months(starts, ends, unit=unit, countries=countries)) / naive)
+            clear_tables()
+            columns.append(best_time(lambda: duration_months(starts, ends, unit=unit, countries=countries), repeat=1) / naive)
+        print(f"{size:>12,} {naive:>14.4f} {columns[0]:>11.2f}x "
+              + ' '.join(f"{warm:>11.2f}x {cold:>8.2f}x" for warm, cold in zip(columns[1::2], columns[2::2])))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import argparse
+import time
+
+import pandas as pd
+
+from kpi import (build_results_df, calculate_kpi, calculate_productivity, expand_results,
+                 get_first_word, get_year_for_operation, operations)
+from benchmarks.synthetic import make_operations
+
+
+# Construcción original de la tabla larga con iterrows, usada como referencia
+def build_results_df_loop(data):
+    results = []
+    for index, row in data.iterrows():
+        for operation, (start_col, end_col) in operations.items():
+            kpi = calculate_kpi(row[end_col], row[start_col])
+            productividad = calculate_productivity(kpi)
+            year = get_year_for_operation(row[end_col])
+            results.append({
+                'ESTACIONES': get_first_word(operation),
+                'ANO': year,
+                'PAIS': row['PAIS'],
+                'CODIGO': row['NO. OPERACION'],
+                'APODO': row['APODO'],
+                'Indicador_Principal': row[end_col].strftime('%d/%m/%Y') if pd.notnull(row[end_col]) else None,
+                'Indicador_Secundario': row[start_col].strftime('%d/%m/%Y') if pd.notnull(row[start_col]) else None,
+                'TIPO_DE_KPI': operation,
+                'KPI': kpi,
+                'Productividad': productividad
+            })
+    return pd.DataFrame(results)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara la tabla larga vectorizada contra el recorrido con iterrows.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--loop-limit', type=int, default=1_000_000,
+                        help="No ejecutar el recorrido con iterrows por encima de este número de operaciones.")
+    args = parser.parse_args()
+
+    print(f"{'operaciones':>12} {'iterrows (s)':>14} {'vectorizado (s)':>16} {'aceleración':>12}")
+    for size in args.sizes:
+        data = make_operations(size)
+        fast, fast_time = timed(build_results_df, data)
+        if size <= args.loop_limit:
+            slow, slow_time = timed(build_results_df_loop, data)
+            pd.testing.assert_frame_equal(expand_results(fast), slow)
+            print(f"{size:>12,} {slow_time:>14.3f} {fast_time:>16.3f} {slow_time / fast_time:>11.1f}x")
+        else:
+            print(f"{size:>12,} {'-':>14} {fast_time:>16.3f} {'-':>12}")
+
+
+if __name__ == "__main__":
+    main()
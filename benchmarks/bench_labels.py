@@ -0,0 +1,81 @@
+import argparse
+import io
+import sys
+import time
+
+import matplotlib
+matplotlib.use('agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from labels import add_stacked_labels
+
+
+# Etiquetas originales del gráfico apilado: un ax.text por segmento y por total, usadas como referencia
+def add_stacked_labels_loop(ax, kpi_by_year_country):
+    for i, (year, values) in enumerate(kpi_by_year_country.iterrows()):
+        height_accumulator = 0
+        for country in values.index:
+            value = values[country]
+            if value > 0:
+                label_y = height_accumulator + (value / 2)
+                ax.text(i, label_y, f'{int(value)}', ha='center', va='center', fontsize=9, color='white')
+                height_accumulator += value
+        ax.text(i, height_accumulator, f'{int(height_accumulator)}', ha='center', va='bottom', fontsize=9, color='black')
+
+# Dibuja el gráfico apilado con las etiquetas dadas y lo convierte a PNG; devuelve los segundos
+def render_time(table, add_labels):
+    start = time.perf_counter()
+    fig, ax = plt.subplots(figsize=(12, 6))
+    table.plot(kind='bar', stacked=True, ax=ax, legend=False)
+    add_labels(ax, table)
+    fig.tight_layout()
+    fig.savefig(io.BytesIO(), format='png', dpi=100)
+    plt.close(fig)
+    return time.perf_counter() - start
+
+# Centro en pantalla (píxeles) y texto de cada etiqueta no vacía del gráfico apilado
+def label_positions(table, add_labels):
+    fig, ax = plt.subplots(figsize=(12, 6))
+    table.plot(kind='bar', stacked=True, ax=ax, legend=False)
+    add_labels(ax, table)
+    fig.canvas.draw()
+    renderer = fig.canvas.get_renderer()
+    positions = sorted((round(extent.x0 + extent.width / 2), round(extent.y0 + extent.height / 2), text.get_text())
+                       for text in ax.texts if text.get_text() for extent in [text.get_window_extent(renderer)])
+    plt.close(fig)
+    return positions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara el tiempo de dibujo de las etiquetas de valor según el número de barras.")
+    parser.add_argument('--years', type=int, nargs='+', default=[10, 20, 40, 80])
+    parser.add_argument('--countries', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    # Segmentos en cero y vacíos (NaN) incluidos: no llevan etiqueta y no suman al total
+    table = pd.DataFrame(rng.uniform(0, 20, (8, args.countries)), columns=[f'P{i}' for i in range(args.countries)])
+    table = table.mask(rng.random(table.shape) < 0.2, 0).mask(rng.random(table.shape) < 0.1)
+    if label_positions(table, add_stacked_labels) != label_positions(table, add_stacked_labels_loop):
+        print("FALLA: las etiquetas de bar_label no coinciden con las de ax.text")
+        sys.exit(1)
+    print("etiquetas en las mismas posiciones que con ax.text")
+
+    print(f"{'segmentos':>10} {'ax.text (s)':>12} {'bar_label (s)':>14} {'sin etiquetas (s)':>18} "
+          f"{'costo ax.text':>14} {'costo bar_label':>16}")
+    for years in args.years:
+        table = pd.DataFrame(rng.uniform(0, 20, (years, args.countries)),
+                             index=range(2000, 2000 + years), columns=[f'P{i}' for i in range(args.countries)])
+        loop = min(render_time(table, add_stacked_labels_loop) for _ in range(args.repeat))
+        batched = min(render_time(table, add_stacked_labels) for _ in range(args.repeat))
+        bare = min(render_time(table, lambda ax, table: None) for _ in range(args.repeat))
+        # Costo de las etiquetas: tiempo total menos el del mismo gráfico sin etiquetas
+        print(f"{table.size:>10,} {loop:>12.3f} {batched:>14.3f} {bare:>18.3f} "
+              f"{loop - bare:>14.3f} {batched - bare:>16.3f}")
+
+
+if __name__ == "__main__":
+    main()
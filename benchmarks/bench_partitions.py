@@ -0,0 +1,75 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import make_operations
+from cube import build_cube
+from ingest import normalize_dates
+from kpi import build_results_df
+from partitions import build_partitioned
+
+# Columnas del cubo con un arreglo por celda
+array_columns = ['operaciones', 'bosquejo', 'histograma']
+
+
+# Mejor tiempo de `repeat` ejecuciones y el último resultado
+def best_time(func, repeat=3):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+# Verifica que la tabla larga y el cubo particionados sean iguales a los del cálculo de una vez
+def assert_same(expected, result):
+    pd.testing.assert_frame_equal(result[0], expected[0])
+    scalar_columns = [column for column in expected[1].columns if column not in array_columns]
+    pd.testing.assert_frame_equal(result[1][scalar_columns], expected[1][scalar_columns])
+    for column in array_columns:
+        if not all(np.array_equal(a, b) for a, b in zip(result[1][column], expected[1][column])):
+            raise AssertionError(f"la columna {column} del cubo no coincide")
+
+
+# Compara la tabla larga y el cubo calculados por país en 1 a N procesos con el
+# cálculo de una vez, y mide la aceleración y la eficiencia (aceleración / procesos)
+# respecto de un proceso. Con un proceso las particiones se calculan en el
+# proceso principal; con más, el tiempo incluye arrancar el pool ('spawn'). Como
+# hay una partición por país, los procesos útiles son como mucho los países.
+def main():
+    parser = argparse.ArgumentParser(description="Escalado del cálculo por país en varios procesos.")
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--workers', type=int, nargs='+', default=None,
+                        help="procesos a medir (por omisión, de 1 al número de núcleos)")
+    parser.add_argument('--unit', default='dias30')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    workers = args.workers or list(range(1, (os.cpu_count() or 1) + 1))
+
+    data = normalize_dates(make_operations(args.rows))
+    serial_time, expected = best_time(lambda: (build_results_df(data, unit=args.unit), build_cube(data, unit=args.unit)),
+                                      args.repeat)
+    print(f"{args.rows:,} operaciones, {data['PAIS'].nunique()} países, {os.cpu_count()} núcleos")
+    print(f"de una vez: {serial_time:.2f} s")
+
+    print(f"{'procesos':>9} {'segundos':>9} {'aceleración':>12} {'eficiencia':>11}")
+    base_time = None
+    for count in workers:
+        elapsed, result = best_time(lambda: build_partitioned(data, unit=args.unit, workers=count), args.repeat)
+        try:
+            assert_same(expected, result)
+        except AssertionError as error:
+            print(f"FALLA con {count} procesos: {error}")
+            sys.exit(1)
+        base_time = base_time or elapsed
+        speedup = base_time / elapsed
+        print(f"{count:>9} {elapsed:>9.2f} {speedup:>11.2f}x {speedup / count:>10.0%}")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
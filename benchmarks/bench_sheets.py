@@ -0,0 +1,85 @@
+import argparse
+import hashlib
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pandas as pd
+
+import sheets
+from benchmarks.synthetic import make_operations
+
+
+# Servidor HTTP local que imita las hojas publicadas: cada respuesta tarda
+# `latency` segundos y responde 304 cuando el ETag enviado sigue vigente
+def start_stand_in(bodies, latency):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            body = bodies.get(self.path)
+            if body is None:
+                self.send_error(404)
+                return
+            etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/csv')
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara la carga secuencial de las tres hojas contra la carga concurrente con caché.")
+    parser.add_argument('--rows', type=int, default=5_000)
+    parser.add_argument('--latency', type=float, default=0.5)
+    args = parser.parse_args()
+
+    bodies = {f'/hoja{i}.csv': make_operations(args.rows, seed=i).to_csv(index=False).encode('utf-8') for i in range(3)}
+    server = start_stand_in(bodies, args.latency)
+    urls = [f'http://127.0.0.1:{server.server_port}{path}' for path in bodies]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sheets.sheets_dir = Path(tmp)
+
+        _, sequential = timed(lambda: [pd.read_csv(url, header=0) for url in urls])
+        cold, cold_time = timed(sheets.load_sheets, urls)
+        warm, warm_time = timed(sheets.load_sheets, urls)
+        revalidated, revalidated_time = timed(sheets.load_sheets, urls, ttl=0)
+        server.shutdown()
+        server.server_close()
+        offline, offline_time = timed(sheets.load_sheets, urls, ttl=0)
+
+        for frame, _, _ in offline:
+            assert frame is not None
+        print(f"secuencial (pd.read_csv x3):       {sequential:7.3f} s")
+        for name, loaded, elapsed in [('concurrente, sin caché', cold, cold_time),
+                                      ('dentro del TTL', warm, warm_time),
+                                      ('revalidación (304)', revalidated, revalidated_time),
+                                      ('servidor caído', offline, offline_time)]:
+            statuses = ', '.join(sorted({status for _, status, _ in loaded}))
+            print(f"{name + ':':<34} {elapsed:7.3f} s  ({statuses})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import make_operations
+from cube import build_cube, slice_cube
+from ingest import normalize_dates
+from kpi import productivity_labels
+
+
+# Filtros con máscaras booleanas sobre toda la tabla y comparación de texto,
+# como se aplicaban antes del índice por año (referencia)
+def slice_cube_masks(cells, years=None, countries=None, stations=None, productivity=None):
+    mask = np.ones(len(cells), dtype=bool)
+    if years is not None:
+        mask &= (cells['ANO'] >= years[0]).to_numpy() & (cells['ANO'] <= years[1]).to_numpy()
+    if countries is not None:
+        mask &= cells['PAIS'].astype(object).isin(countries).to_numpy()
+    if stations is not None:
+        mask &= cells['ESTACIONES'].astype(object).isin(stations).to_numpy()
+    if productivity is not None:
+        mask &= cells['Productividad'].astype(object).isin(productivity).to_numpy()
+    return cells[mask]
+
+# Mejor tiempo de `repeat` ejecuciones de todas las selecciones
+def best_time(func, selections, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for selection in selections:
+            func(**selection)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara el filtro por rango de años e índices enteros con las máscaras booleanas.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000])
+    args = parser.parse_args()
+
+    print(f"{'operaciones':>12} {'celdas':>8} {'máscaras (ms)':>14} {'índice (ms)':>12} {'aceleración':>12}")
+    for size in args.sizes:
+        cube = build_cube(normalize_dates(make_operations(size)))
+        years = cube['ANO'].dropna().astype(int)
+        first, last = int(years.min()), int(years.max())
+        selections = [
+            {'years': (first + offset, last - offset), 'countries': countries, 'stations': stations,
+             'productivity': productivity_labels}
+            for offset in range(0, (last - first) // 2 + 1)
+            for countries in (None, ['BRASIL'])
+            for stations in (None, ['Aprobacion'], ['Vigencia', 'Elegibilidad'])
+        ]
+        for selection in selections:
+            pd.testing.assert_frame_equal(slice_cube(cube, **selection), slice_cube_masks(cube, **selection))
+
+        masks = best_time(lambda **selection: slice_cube_masks(cube, **selection), selections)
+        indexed = best_time(lambda **selection: slice_cube(cube, **selection), selections)
+        print(f"{size:>12,} {len(cube):>8,} {masks * 1000:>14.2f} {indexed * 1000:>12.2f} {masks / indexed:>11.1f}x")
+
+
+if __name__ == "__main__":
+    main()
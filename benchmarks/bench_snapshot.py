@@ -0,0 +1,50 @@
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+import snapshot
+from ingest import file_digest, read_workbook
+from benchmarks.synthetic import make_operations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara la carga desde la instantánea columnar contra pd.read_excel.")
+    parser.add_argument('--rows', type=int, default=500_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot.snapshot_dir = Path(tmp) / 'snapshots'
+        workbook = Path(tmp) / 'operaciones.xlsx'
+
+        print(f"Generando planilla de {args.rows:,} filas...")
+        make_operations(args.rows).to_excel(workbook, index=False)
+        content = workbook.read_bytes()
+        digest = file_digest(content)
+
+        start = time.perf_counter()
+        data = read_workbook(content)
+        excel_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        snapshot.write_snapshot(digest, data)
+        write_time = time.perf_counter() - start
+
+        load_times = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            loaded = snapshot.load_snapshot(digest)
+            load_times.append(time.perf_counter() - start)
+        pd.testing.assert_frame_equal(loaded.astype(data.dtypes.to_dict()), data, check_dtype=False)
+
+        print(f"pd.read_excel + to_datetime: {excel_time:9.3f} s")
+        print(f"escritura de la instantánea: {write_time:9.3f} s")
+        print(f"carga de la instantánea:     {min(load_times) * 1000:9.1f} ms (mejor de {args.repeat})")
+        print(f"aceleración:                 {excel_time / min(load_times):9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import argparse
+import re
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from spanish_dates import parse_spanish_dates
+
+
+# Conversión original de pages/p.py para la planilla de proyectos ('15 ENE 14')
+def convert_spanish_date(date_str):
+    months = {
+        'ENE': 'Jan', 'FEB': 'Feb', 'MAR': 'Mar', 'ABR': 'Apr', 'MAY': 'May', 'JUN': 'Jun',
+        'JUL': 'Jul', 'AGO': 'Aug', 'SEP': 'Sep', 'OCT': 'Oct', 'NOV': 'Nov', 'DIC': 'Dec'
+    }
+    match = re.match(r"(\d{2}) (\w{3}) (\d{2})", date_str)
+    if match:
+        day, spanish_month, year = match.groups()
+        english_month = months.get(spanish_month.upper())
+        if english_month:
+            return datetime.strptime(f"{day} {english_month} 20{year}", "%d %b %Y").strftime("%d/%m/%Y")
+    return date_str
+
+# Conversión original de pages/p.py para las fechas de operaciones y desembolsos
+def convert_dates(date_str):
+    if pd.isnull(date_str):
+        return None
+
+    if not isinstance(date_str, str):
+        return date_str
+
+    months = {
+        'ene': '01', 'feb': '02', 'mar': '03', 'abr': '04', 'may': '05', 'jun': '06',
+        'jul': '07', 'ago': '08', 'sep': '09', 'oct': '10', 'nov': '11', 'dic': '12'
+    }
+
+    try:
+        day, month, year = date_str.split('-')
+        if len(year) == 2: year = f"20{year}"
+        month = months.get(month[:3].lower(), '00')
+        return f"{day.zfill(2)}/{month}/{year}"
+    except ValueError:
+        pass
+
+    try:
+        parts = date_str.split(' ')
+        day = parts[1]
+        month = parts[3].lower()[:3]
+        year = parts[5]
+        return f"{day.zfill(2)}/{months[month]}/{year}"
+    except (ValueError, IndexError):
+        pass
+
+    try:
+        return datetime.strptime(date_str, '%d-%b-%y').strftime('%d/%m/%Y')
+    except ValueError:
+        pass
+
+    return date_str
+
+
+weekdays = ['lunes', 'martes', 'miércoles', 'jueves', 'viernes', 'sábado', 'domingo']
+month_names = ['enero', 'febrero', 'marzo', 'abril', 'mayo', 'junio', 'julio', 'agosto',
+               'septiembre', 'octubre', 'noviembre', 'diciembre']
+
+
+# Genera columnas con fechas en los formatos de las planillas de Google Sheets. En
+# la columna mezclada hay además fechas reales de Excel (datetime) y texto ya
+# convertido ('17/11/2015'), que la conversión original dejaba tal cual.
+def make_columns(n_cells, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp('2010-01-01') + pd.to_timedelta(rng.integers(0, 5000, size=n_cells), unit='D')
+    short = [f"{d.day:02d} {month_names[d.month - 1][:3].upper()} {d.year % 100:02d}" for d in dates]
+    dashed = [f"{d.day}-{month_names[d.month - 1][:3]}-{d.year % 100:02d}" for d in dates]
+    long = [f"{weekdays[d.dayofweek]}, {d.day} de {month_names[d.month - 1]} de {d.year}" for d in dates]
+    mixed = pd.Series(np.where(rng.random(n_cells) < 0.5, dashed, long), dtype=object)
+    kind = rng.random(n_cells)
+    mixed[kind < 0.05] = dates[kind < 0.05].to_pydatetime()
+    mixed[(kind >= 0.05) & (kind < 0.1)] = dates[(kind >= 0.05) & (kind < 0.1)].strftime('%d/%m/%Y')
+    mixed[rng.random(n_cells) < 0.1] = None
+    return pd.Series(short, dtype=object), mixed
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara el parser vectorizado de fechas en español contra .apply.")
+    parser.add_argument('--cells', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    short, mixed = make_columns(args.cells)
+    for name, column, original in [('15 ENE 14', short, lambda s: s.apply(convert_spanish_date)),
+                                   ('15-ago-14 / martes, 17 de ...', mixed, lambda s: s.apply(convert_dates))]:
+        slow, slow_time = timed(original, column)
+        fast, fast_time = timed(parse_spanish_dates, column)
+        expected = pd.to_datetime(slow, format='%d/%m/%Y', errors='coerce')
+        pd.testing.assert_series_equal(fast, expected.astype('datetime64[ns]'), check_names=False)
+        print(f"{name:<32} apply: {slow_time:7.3f} s  vectorizado: {fast_time:7.3f} s  aceleración: {slow_time / fast_time:6.1f}x")
+
+    # Formatos que la conversión original no entendía: ISO ('2015-11-17' daba
+    # '2015/00/2017') y texto libre, que queda vacío
+    edge = pd.Series([datetime(2015, 11, 17), '15-ago-14', '17/11/2015', '2015-11-17', 'pendiente', None], dtype=object)
+    expected = pd.Series(pd.to_datetime(['2015-11-17', '2014-08-15', '2015-11-17', '2015-11-17', None, None]))
+    pd.testing.assert_series_equal(parse_spanish_dates(edge), expected.astype('datetime64[ns]'))
+    print("fechas de Excel, dd/mm/aaaa e ISO: OK")
+
+
+if __name__ == "__main__":
+    main()
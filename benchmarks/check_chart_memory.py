@@ -0,0 +1,65 @@
+import argparse
+import itertools
+import runpy
+import sys
+import time
+import tracemalloc
+
+import matplotlib.pyplot as plt
+
+from benchmarks.synthetic import make_operations
+from cube import build_cube
+from ingest import normalize_dates
+
+page_path = 'pages/1_Eficiencia_Por_Estaciones.py'
+
+
+# Simula `reruns` reruns de la página de eficiencia con filtros que van
+# cambiando (filtro -> agregados -> gráficos) y verifica que no queden figuras
+# abiertas y que la memoria no crezca una vez que la caché de gráficos está caliente.
+def main():
+    parser = argparse.ArgumentParser(description="Verifica que los reruns con gráficos en caché no acumulen memoria.")
+    parser.add_argument('--rows', type=int, default=5_000)
+    parser.add_argument('--reruns', type=int, default=1_000)
+    parser.add_argument('--combos', type=int, default=16, help="combinaciones de filtros distintas que se recorren")
+    parser.add_argument('--warmup', type=int, default=100)
+    parser.add_argument('--max-growth-mb', type=float, default=2.0)
+    args = parser.parse_args()
+
+    page = runpy.run_path(page_path, run_name='check')
+    cube = build_cube(normalize_dates(make_operations(args.rows)))
+
+    years = sorted(cube['ANO'].dropna().astype(int).unique())
+    ranges = [(low, high) for low, high in itertools.combinations(years, 2)][:args.combos]
+    stations = ['Todas']
+    filters = list(itertools.islice(itertools.cycle(itertools.product(ranges, stations)), args.reruns))
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    for rerun, (selected_years, selected_station) in enumerate(filters, start=1):
+        filtered_cells, filtered_cube = page['filter_cells'](cube, selected_years, selected_station)
+        aggregates = page['aggregate_efficiency'](filtered_cells, filtered_cube)
+        page['render_efficiency'](aggregates)
+        if rerun == args.warmup:
+            baseline = tracemalloc.get_traced_memory()[0]
+    elapsed = time.perf_counter() - start
+    final = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    growth = (final - baseline) / 2**20
+    open_figures = len(plt.get_fignums())
+    print(f"reruns:                 {args.reruns:,} ({len(ranges)} combinaciones de filtros)")
+    print(f"tiempo por rerun:       {elapsed / args.reruns * 1000:8.1f} ms")
+    print(f"figuras abiertas:       {open_figures:8d}")
+    print(f"memoria tras {args.warmup:>4} reruns: {baseline / 2**20:8.1f} MB")
+    print(f"memoria al final:       {final / 2**20:8.1f} MB")
+    print(f"crecimiento:            {growth:8.2f} MB")
+
+    if open_figures or growth > args.max_growth_mb:
+        print("FALLA: la memoria crece entre reruns")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
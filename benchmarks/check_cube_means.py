@@ -0,0 +1,92 @@
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import make_operations
+from cube import build_cube, cube_pivot_mean, slice_cube
+from ingest import normalize_dates
+from kpi import build_results_df, expand_results
+from reports import build_reports
+
+
+# Celdas de los reportes de una planilla real (kpi_promedio_por_pais_y_año y
+# resumen_alta_demora) cuyo valor cambia respecto de pivot_table(aggfunc='mean').round(2)
+# sobre la tabla larga: (reporte, país, año, antes, ahora)
+def changed_report_cells(path):
+    reports = build_reports(normalize_dates(pd.read_excel(path)))
+    long = expand_results(reports['resultados'])
+    alta_demora = long[long['Productividad'] == 'Alta Demora']
+    tables = [
+        ('kpi_promedio_por_pais_y_año', reports['kpi_por_pais'].set_index('PAIS').replace('', np.nan), long),
+        ('resumen_alta_demora', reports['alta_demora'], alta_demora)
+    ]
+    changed = []
+    for name, table, rows in tables:
+        before = rows.pivot_table(values='KPI', index='PAIS', columns='ANO', aggfunc='mean').round(2)
+        before.columns = before.columns.astype(int)
+        after = table.astype('float64').reindex_like(before)
+        for (country, year), differs in ((after - before).abs() > 1e-9).stack().items():
+            if differs:
+                changed.append((name, country, year, before.loc[country, year], after.loc[country, year]))
+    return changed
+
+
+# Verifica los promedios por país y año redondeados a dos decimales del cubo
+# contra pivot_table(aggfunc='mean').round(2) sobre la tabla larga, por estación
+# y en varias planillas chicas (muchos grupos de pocos valores, donde los
+# empates son frecuentes). El cubo redondea el cociente exacto con las mitades
+# al par; pandas redondea la media en coma flotante, así que en un empate exacto
+# puede caer del otro lado según el orden de la suma, que los totales del cubo no
+# conservan. La tolerancia es 0,01 y solo en empates exactos. Con --workbook
+# lista los valores de los reportes de esa planilla que cambian (CHANGELOG.md).
+def main():
+    parser = argparse.ArgumentParser(description="Compara los promedios redondeados del cubo con los de pivot_table.")
+    parser.add_argument('--rows', type=int, default=300)
+    parser.add_argument('--seeds', type=int, default=20)
+    parser.add_argument('--workbook', help="planilla real cuyos valores cambiados en los reportes se listan")
+    args = parser.parse_args()
+
+    compared, ties, differences, failures = 0, 0, 0, 0
+    for seed in range(args.seeds):
+        data = normalize_dates(make_operations(args.rows, seed=seed))
+        cube = build_cube(data)
+        long = expand_results(build_results_df(data))
+        for station in [None] + sorted(long['ESTACIONES'].unique()):
+            rows = long if station is None else long[long['ESTACIONES'] == station]
+            expected = rows.pivot_table(values='KPI', index='PAIS', columns='ANO', aggfunc='mean').round(2)
+            cells = cube if station is None else slice_cube(cube, stations=[station])
+            result = cube_pivot_mean(cells, 'PAIS', 'ANO', decimals=2).reindex_like(expected)
+
+            # Empates exactos: la suma de centésimas por 2 es un múltiplo impar del conteo
+            hundredths = np.rint(rows['KPI'] * 100)
+            grouped = hundredths.groupby([rows['PAIS'], rows['ANO']]).agg(['sum', 'count'])
+            tie = (2 * grouped['sum'] % grouped['count'] == 0) & ((2 * grouped['sum'] // grouped['count']) % 2 == 1)
+            tie = tie.unstack('ANO').reindex_like(expected).fillna(False).astype(bool).to_numpy()
+
+            present = expected.notna().to_numpy()
+            gap = np.abs(result.to_numpy() - expected.to_numpy())
+            differs = present & (gap > 1e-9)
+            compared += int(present.sum())
+            ties += int((present & tie).sum())
+            differences += int(differs.sum())
+            failures += int((differs & ((gap > 0.01 + 1e-9) | ~tie)).sum())
+            failures += int((result.isna().to_numpy() != ~present).sum())
+
+    print(f"promedios comparados: {compared:,}, empates exactos: {ties:,}, "
+          f"distintos de pandas: {differences:,}, fuera de la tolerancia: {failures:,}")
+    if args.workbook:
+        changed = changed_report_cells(args.workbook)
+        print(f"valores que cambian en los reportes de {args.workbook}: {len(changed)}")
+        for name, country, year, before, after in changed:
+            print(f"  {name}: {country} {year}: {before:.2f} -> {after:.2f}")
+
+    if failures:
+        print("FALLA")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
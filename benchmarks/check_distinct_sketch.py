@@ -0,0 +1,70 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import make_operations
+from cube import build_cube, slice_cube
+from ingest import normalize_dates
+from sketches import distinct_count, sketch_registers
+
+
+# Mejor tiempo de `repeat` ejecuciones
+def best_time(func, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+# Verifica que el conteo de operaciones distintas con los bosquejos de las celdas
+# no se aleje del exacto más de `--sigmas` errores típicos (1,04 / sqrt(m)) en
+# ninguna selección de años, países y estaciones, y compara los tiempos.
+def main():
+    parser = argparse.ArgumentParser(description="Compara el conteo de distintos con bosquejos contra el exacto.")
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--selections', type=int, default=200)
+    parser.add_argument('--sigmas', type=float, default=4.0, help="error relativo máximo, en errores típicos")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    cube = build_cube(normalize_dates(make_operations(args.rows)))
+    years = cube['ANO'].dropna().astype(int)
+    first, last = int(years.min()), int(years.max())
+    countries = list(cube['PAIS'].cat.categories)
+    stations = list(cube['ESTACIONES'].cat.categories)
+
+    rng = np.random.default_rng(args.seed)
+    errors = []
+    for _ in range(args.selections):
+        low, high = sorted(rng.integers(first, last + 1, size=2))
+        cells = slice_cube(cube, years=(int(low), int(high)),
+                           countries=list(rng.choice(countries, size=rng.integers(1, len(countries) + 1), replace=False)),
+                           stations=list(rng.choice(stations, size=rng.integers(1, len(stations) + 1), replace=False)))
+        exact = distinct_count(cells['operaciones'], cells['bosquejo'], exact_limit=np.inf)
+        estimate = distinct_count(cells['operaciones'], cells['bosquejo'], exact_limit=0)
+        if exact:
+            errors.append(abs(estimate - exact) / exact)
+
+    errors = np.array(errors)
+    bound = args.sigmas * 1.04 / np.sqrt(sketch_registers)
+    print(f"selecciones: {len(errors)}, error relativo medio: {errors.mean():.2%}, "
+          f"máximo: {errors.max():.2%} (cota {bound:.2%})")
+
+    unique_time = best_time(lambda: len(np.unique(np.concatenate(cube['operaciones'].to_numpy()))))
+    exact_time = best_time(lambda: distinct_count(cube['operaciones'], cube['bosquejo'], exact_limit=np.inf))
+    sketch_time = best_time(lambda: distinct_count(cube['operaciones'], cube['bosquejo'], exact_limit=0))
+    print(f"todo el cubo ({len(cube):,} celdas): np.unique {unique_time * 1000:.1f} ms, "
+          f"exacto {exact_time * 1000:.1f} ms, bosquejos {sketch_time * 1000:.1f} ms")
+
+    if errors.max() > bound:
+        print("FALLA: el error de los bosquejos supera la cota")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
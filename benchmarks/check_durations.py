@@ -0,0 +1,58 @@
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import make_operations
+from durations import duration_months
+from ingest import normalize_dates
+from kpi import build_results_df, calculate_kpi, date_columns, operations, repeat_categorical, station_dates
+
+
+# Planilla sintética con una hora del día al azar en cada fecha
+def with_time_of_day(data, seed=0):
+    rng = np.random.default_rng(seed)
+    data = data.copy()
+    for column in date_columns:
+        data[column] = data[column] + pd.to_timedelta(rng.integers(0, 24 * 60, size=len(data)), unit='min')
+    return data
+
+
+# Verifica con fechas que tienen hora del día que el KPI en días / 30 sea el de
+# calculate_kpi fila por fila ((fin - inicio).days / 30, como el recorrido con
+# iterrows original) y que los meses calendario y los días hábiles no dependan
+# de la hora (cuentan fechas).
+def main():
+    parser = argparse.ArgumentParser(description="Compara las duraciones con hora del día contra el cálculo fila por fila.")
+    parser.add_argument('--rows', type=int, default=2_000)
+    args = parser.parse_args()
+
+    dates_only = normalize_dates(make_operations(args.rows))
+    data = with_time_of_day(dates_only)
+    results_df = build_results_df(data)
+    expected = [calculate_kpi(row[end], row[start]) for _, row in data.iterrows() for start, end in operations.values()]
+    expected = np.array([np.nan if value is None else value for value in expected])
+    kpi = np.round(results_df['KPI'].to_numpy(dtype='float64'), 2)  # El KPI se guarda como float32
+    mismatches = int(np.count_nonzero(~((kpi == expected) | (np.isnan(kpi) & np.isnan(expected)))))
+    print(f"días / 30: {mismatches} de {len(kpi):,} estaciones distintas del cálculo fila por fila")
+
+    starts, ends = station_dates(data)
+    date_starts, date_ends = station_dates(dates_only)
+    countries = repeat_categorical(data['PAIS'], len(operations))
+    failures = mismatches > 0
+    for unit in ['calendario', 'habiles']:
+        months = duration_months(starts, ends, unit=unit, countries=countries)
+        reference = duration_months(date_starts, date_ends, unit=unit, countries=countries)
+        equal = np.array_equal(months, reference, equal_nan=True)
+        print(f"{unit}: {'igual' if equal else 'distinto'} con y sin hora del día")
+        failures |= not equal
+
+    if failures:
+        print("FALLA")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from joins import indexed_left_join, normalize_keys
+
+
+# Verifica que las claves numéricas coincidan aunque un lado las tenga como
+# enteros y el otro como float (Excel lee como float una columna de números con
+# celdas vacías: 123 -> 123.0), en columnas numéricas y en columnas mezcladas
+# con texto, con claves únicas y repetidas a la derecha. El texto ('0123') no se
+# toma como número.
+def main():
+    parser = argparse.ArgumentParser(description="Uniones con claves enteras y float mezcladas.")
+    parser.add_argument('--rows', type=int, default=1_000)
+    args = parser.parse_args()
+
+    keys = np.arange(1, args.rows + 1)
+    failures = 0
+
+    # Izquierda entera, derecha float con una celda vacía
+    left = pd.DataFrame({'NO. OPERACION': keys, 'PAIS': 'ARGENTINA'})
+    right = pd.DataFrame({'NO. OPERACION': np.append(keys.astype('float64'), np.nan), 'MONTO': np.arange(args.rows + 1.0)})
+    joined, report = indexed_left_join(left, right, 'NO. OPERACION', ['PAIS', 'MONTO'], name='enteros / float')
+    failures += report['Sin coincidencia'] != 0 or not np.array_equal(joined['MONTO'], np.arange(args.rows, dtype='float64'))
+    print(report)
+
+    # Columnas mezcladas (texto y números) de los dos lados y claves repetidas a la derecha
+    left = pd.DataFrame({'NO. OPERACION': pd.Series(['AR-L1', 5, 6.0, '0123', 7.5], dtype=object)})
+    right = pd.DataFrame({'NO. OPERACION': pd.Series(['ARL1', 5.0, 6, 123, 7.5, 6.0], dtype=object),
+                          'ETAPA': ['a', 'b', 'c', 'd', 'e', 'f']})
+    joined, report = indexed_left_join(left, right, 'NO. OPERACION', ['ETAPA'], name='mezcladas')
+    expected = ['a', 'b', 'c', 'f', '', 'e']
+    failures += joined['ETAPA'].fillna('').tolist() != expected or report['Sin coincidencia'] != 1
+    print(report)
+
+    keys = normalize_keys(pd.Series([123, 123.0, '123', '0123', None], dtype=object)).tolist()
+    failures += keys[:4] != ['123', '123', '123', '0123'] or keys[4] is not None
+    print(f"claves normalizadas: {keys}")
+
+    if failures:
+        print("FALLA")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import argparse
+import io
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+from benchmarks.synthetic import make_operations
+from cube import additive_columns, build_cube, build_cube_workbooks, cube_dimensions
+from ingest import normalize_dates
+
+
+# Pico de memoria (tracemalloc, MB) y tiempo de una llamada
+def peak_memory(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, peak / 2**20, time.perf_counter() - start
+
+# Contenido .xlsx de una planilla sintética
+def workbook_bytes(rows, seed=0):
+    content = io.BytesIO()
+    make_operations(rows, seed=seed).to_excel(content, index=False)
+    return content.getvalue()
+
+# Cubo de las planillas concatenadas en memoria, como referencia
+def concatenated_cube(contents):
+    frames = [pd.read_excel(io.BytesIO(content)) for content in contents]
+    return build_cube(normalize_dates(pd.concat(frames, ignore_index=True)))
+
+# Diferencias entre el cubo combinado y el de referencia (sumas, conteos y
+# operaciones distintas de cada celda); None si son iguales
+def cube_difference(combined, expected):
+    try:
+        pd.testing.assert_frame_equal(combined[cube_dimensions + additive_columns],
+                                      expected[cube_dimensions + additive_columns], check_dtype=False)
+    except AssertionError as error:
+        return str(error)
+    if [len(codes) for codes in combined['operaciones']] != [len(codes) for codes in expected['operaciones']]:
+        return "las operaciones distintas por celda no coinciden"
+    return None
+
+# Mide ambos caminos sobre las mismas planillas y verifica que den el mismo cubo
+def measure(contents, chunk_rows, workers):
+    expected, expected_peak, expected_time = peak_memory(lambda: concatenated_cube(contents))
+    combined, combined_peak, combined_time = peak_memory(
+        lambda: build_cube_workbooks(contents, workers=workers, chunk_size=chunk_rows))
+    difference = cube_difference(combined, expected)
+    if difference:
+        print(f"FALLA: {difference}")
+        sys.exit(1)
+    return expected_peak, expected_time, combined_peak, combined_time
+
+
+# Verifica que el cubo combinado de varias planillas leídas por tandas sea igual
+# al cubo de las planillas concatenadas, y que su pico de memoria no crezca con
+# el número de filas, con planillas de varias tandas de `--chunk-rows` filas:
+#  - períodos: la misma planilla repetida 2, 4 y 8 veces (p. ej. un ejercicio
+#    por archivo con las mismas operaciones); el pico del camino combinado debe
+#    quedar plano. Se empieza en dos planillas porque desde la segunda el pico
+#    incluye combinar el acumulado con el cubo nuevo.
+#  - operaciones nuevas: planillas de 2, 4 y 8 tandas con operaciones distintas.
+#    Los códigos de cada operación (en las celdas y en el índice de códigos) y
+#    la tabla de textos compartidos de openpyxl crecen con ellas, así que el
+#    pico crece; se informa y se acota el crecimiento por operación agregada.
+# Todo el cálculo es en memoria (nada se escribe a disco); con más de un proceso
+# el pico solo mide el proceso principal.
+def main():
+    parser = argparse.ArgumentParser(description="Compara el cubo combinado de varias planillas con el de la concatenación.")
+    parser.add_argument('--chunk-rows', type=int, default=5_000,
+                        help="filas por tanda (la aplicación usa ingest.chunk_rows; más chico para que la prueba sea corta)")
+    parser.add_argument('--periods', type=int, nargs='+', default=[2, 4, 8])
+    parser.add_argument('--chunks', type=int, nargs='+', default=[2, 4, 8], help="tandas por planilla")
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--flat-tolerance', type=float, default=0.15,
+                        help="crecimiento relativo aceptado del pico al repetir períodos")
+    parser.add_argument('--bytes-per-operation', type=int, default=600,
+                        help="crecimiento aceptado del pico por operación nueva")
+    args = parser.parse_args()
+    failures = []
+
+    print(f"tandas de {args.chunk_rows:,} filas")
+    print(f"{'planillas':>10} {'filas':>9} {'concatenado (s)':>16} {'pico (MB)':>10} {'combinado (s)':>14} {'pico (MB)':>10}")
+    content = workbook_bytes(2 * args.chunk_rows)
+    peaks = []
+    for periods in args.periods:
+        expected_peak, expected_time, combined_peak, combined_time = measure([content] * periods, args.chunk_rows,
+                                                                                args.workers)
+        peaks.append(combined_peak)
+        print(f"{periods:>10} {periods * 2 * args.chunk_rows:>9,} {expected_time:>16.2f} {expected_peak:>10.1f} "
+              f"{combined_time:>14.2f} {combined_peak:>10.1f}")
+    growth = max(peaks) / min(peaks) - 1
+    print(f"períodos con las mismas operaciones: el pico combinado varía {growth:.0%}")
+    if growth > args.flat_tolerance:
+        failures.append(f"el pico crece {growth:.0%} al repetir períodos")
+
+    print(f"{'tandas':>10} {'filas':>9} {'concatenado (s)':>16} {'pico (MB)':>10} {'combinado (s)':>14} {'pico (MB)':>10}")
+    sizes, peaks = [], []
+    for chunks in args.chunks:
+        rows = chunks * args.chunk_rows
+        expected_peak, expected_time, combined_peak, combined_time = measure([workbook_bytes(rows)], args.chunk_rows,
+                                                                                args.workers)
+        sizes.append(rows)
+        peaks.append(combined_peak)
+        print(f"{chunks:>10} {rows:>9,} {expected_time:>16.2f} {expected_peak:>10.1f} "
+              f"{combined_time:>14.2f} {combined_peak:>10.1f}")
+    per_operation = (peaks[-1] - peaks[0]) * 2**20 / (sizes[-1] - sizes[0])
+    print(f"operaciones nuevas: el pico combinado crece {per_operation:.0f} bytes por operación")
+    if per_operation > args.bytes_per_operation:
+        failures.append(f"el pico crece {per_operation:.0f} bytes por operación")
+
+    if failures:
+        print("FALLA: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
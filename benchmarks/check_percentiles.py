@@ -0,0 +1,73 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import make_operations
+from cube import aggregate_cube, cube_base, measure_scale
+from distributions import distribution_table, histogram_limit, histogram_width, quantile_levels
+from ingest import normalize_dates
+
+
+# Mejor tiempo de `repeat` ejecuciones
+def best_time(func, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+# Verifica que los percentiles de los histogramas de las celdas, por estación,
+# país y año, no se alejen de los exactos (np.quantile sobre los KPI de cada
+# grupo) más que el ancho de una clase, y compara los tiempos con los del
+# promedio. Los percentiles exactos se toman con el método 'inverted_cdf' (el
+# menor valor con frecuencia acumulada suficiente), que cae en la misma clase
+# que el del histograma; con la interpolación lineal de np.quantile la
+# diferencia en grupos chicos puede ser la distancia entre dos valores.
+def main():
+    parser = argparse.ArgumentParser(description="Compara los percentiles de los histogramas del cubo con los exactos.")
+    parser.add_argument('--rows', type=int, default=100_000)
+    args = parser.parse_args()
+
+    base = cube_base(normalize_dates(make_operations(args.rows)))
+    cube = aggregate_cube(base)
+    base = base.assign(kpi=base['kpi'] / measure_scale['kpi']).dropna(subset=['kpi'])
+    levels = list(quantile_levels.values())
+
+    print(f"{'grupo':>12} {'grupos':>7} {'error máx.':>11} {'error medio':>12} {'lineal máx.':>12}")
+    worst = 0.0
+    for by in ['ESTACIONES', 'PAIS', 'ANO']:
+        table = distribution_table(cube, by, scale=measure_scale['kpi']).set_index(by)
+        errors, linear = [], []
+        for key, values in base.groupby(by, observed=True)['kpi']:
+            estimate = table.loc[key, list(quantile_levels)].to_numpy(dtype='float64')
+            exact = np.quantile(values, levels, method='inverted_cdf')
+            # Los percentiles en las clases abiertas (fuera de 0 a histogram_limit) solo se acotan por el rango
+            inside = (exact >= 0) & (exact < histogram_limit)
+            errors.extend(np.abs(estimate - exact)[inside])
+            linear.extend(np.abs(estimate - np.quantile(values, levels))[inside])
+        errors = np.array(errors)
+        worst = max(worst, errors.max())
+        print(f"{by:>12} {len(table):>7} {errors.max():>11.3f} {errors.mean():>12.3f} {max(linear):>12.3f}")
+
+    # Redondeo de la tabla a dos decimales
+    bound = histogram_width + 0.005
+    print(f"cota: {bound:.3f} meses")
+
+    mean_time = best_time(lambda: cube.groupby('ESTACIONES', observed=True)[['kpi_sum', 'kpi_count']].sum())
+    table_time = best_time(lambda: distribution_table(cube, 'ESTACIONES', scale=measure_scale['kpi']))
+    exact_time = best_time(lambda: base.groupby('ESTACIONES', observed=True)['kpi'].quantile(levels))
+    print(f"por estación ({len(cube):,} celdas, {len(base):,} valores): promedio {mean_time * 1000:.1f} ms, "
+          f"percentiles del cubo {table_time * 1000:.1f} ms, exactos sobre la tabla {exact_time * 1000:.1f} ms")
+
+    if worst > bound:
+        print("FALLA: el error de los percentiles supera la cota")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import argparse
+import sys
+
+import pandas as pd
+
+from benchmarks.bench_kpi import build_results_df_loop
+from benchmarks.synthetic import make_operations
+from ingest import normalize_dates
+from kpi import build_results_df, expand_results, memory_report
+
+
+# Verifica que la tabla larga compacta ocupe menos bytes por fila que la
+# representación original y que expand_results la reconstruya sin diferencias
+# respecto del recorrido con iterrows.
+def main():
+    parser = argparse.ArgumentParser(description="Compara la memoria de la tabla larga compacta con la original.")
+    parser.add_argument('--rows', type=int, default=20_000)
+    parser.add_argument('--check-rows', type=int, default=2_000,
+                        help="operaciones con las que se compara contra el recorrido con iterrows")
+    parser.add_argument('--min-ratio', type=float, default=3.0,
+                        help="reducción mínima de bytes por fila que se exige")
+    args = parser.parse_args()
+
+    sample = normalize_dates(make_operations(args.check_rows))
+    pd.testing.assert_frame_equal(expand_results(build_results_df(sample)), build_results_df_loop(sample))
+
+    report = memory_report(build_results_df(normalize_dates(make_operations(args.rows))))
+    print(report.to_string(index=False))
+    before, after = report['Bytes por fila']
+    ratio = before / after
+    print(f"reducción: {ratio:.1f}x")
+
+    if ratio < args.min_ratio:
+        print("FALLA: la tabla compacta no reduce la memoria lo suficiente")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import argparse
+import io
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_kpi import build_results_df_loop
+from benchmarks.synthetic import make_operations
+from charts import draw_country_average, draw_productivity_counts, draw_stacked_by_year, figure_bytes
+from cube import build_cube
+from exports import excel_bytes
+from ingest import normalize_dates, read_workbook
+from kpi import build_results_df, date_columns, expand_results
+from reports import aggregate_efficiency, filter_cells
+
+# Directorio por defecto de los resultados en JSON
+results_dir = Path(__file__).parent / 'results'
+
+
+# Agregados de la página de eficiencia con pivot_table/groupby sobre la tabla
+# larga, como se calculaban antes del cubo (referencia)
+def pivot_aggregates(results_df):
+    filtered_df = results_df[results_df['Productividad'] != "Datos insuficientes"]
+    return {
+        'kpi_by_year_country': results_df.pivot_table(values='KPI', index='ANO', columns='PAIS', aggfunc='mean').fillna(0),
+        'kpi_pivot_df': results_df.pivot_table(values='KPI', index='PAIS', columns='ANO', aggfunc='mean').round(2),
+        'kpi_avg_by_country': filtered_df.groupby('PAIS')['KPI'].mean().sort_values(),
+        'productivity_count': filtered_df['Productividad'].value_counts().sort_values(),
+        'unique_operation_count': filtered_df['CODIGO'].nunique()
+    }
+
+# Dibuja y rasteriza los tres gráficos de la página de eficiencia (sin caché)
+def render_figures(aggregates):
+    return [
+        figure_bytes(draw_country_average(aggregates['kpi_avg_by_country'], (7, 5))),
+        figure_bytes(draw_productivity_counts(aggregates['productivity_count'], (7, 5))),
+        figure_bytes(draw_stacked_by_year(aggregates['kpi_by_year_country'], (12, 6)))
+    ]
+
+# Exportación con pd.ExcelWriter de la tabla larga original (referencia)
+def excel_writer_bytes(df):
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        df.to_excel(writer, index=False)
+    return output.getvalue()
+
+
+# Entradas de cada etapa para un tamaño de planilla
+def prepare(size, seed=0):
+    data = normalize_dates(make_operations(size, seed=seed))
+    content = io.BytesIO()
+    data.to_excel(content, index=False)
+    # Fechas como texto, como llegan las columnas con celdas mixtas
+    raw_text = data.copy()
+    for col in date_columns:
+        raw_text[col] = data[col].dt.strftime('%Y-%m-%d').astype(object)
+    results_df = build_results_df(data)
+    cube = build_cube(data)
+    years = cube['ANO'].dropna()
+    return {
+        'content': content.getvalue(),
+        'raw_text': raw_text,
+        'data': data,
+        'results_df': results_df,
+        'expanded': expand_results(results_df),
+        'cube': cube,
+        'years': (int(years.min()), int(years.max())),
+        'aggregates': pivot_aggregates(expand_results(results_df))
+    }
+
+# Etapas medidas: nombre -> (función de las entradas, ¿es la referencia con iterrows?)
+stages = {
+    'read_excel': (lambda inputs: read_workbook(inputs['content']), False),
+    'to_datetime': (lambda inputs: normalize_dates(inputs['raw_text']), False),
+    'kpi_iterrows': (lambda inputs: build_results_df_loop(inputs['data']), True),
+    'kpi_vectorizado': (lambda inputs: build_results_df(inputs['data']), False),
+    'cubo': (lambda inputs: build_cube(inputs['data']), False),
+    'pivot_table': (lambda inputs: pivot_aggregates(inputs['expanded']), False),
+    'agregados_cubo': (lambda inputs: aggregate_efficiency(*filter_cells(inputs['cube'], inputs['years'], 'Todas')), False),
+    'graficos': (lambda inputs: render_figures(inputs['aggregates']), False),
+    'excel_writer': (lambda inputs: excel_writer_bytes(inputs['expanded']), False),
+    'excel_streaming': (lambda inputs: excel_bytes(inputs['results_df'], transform=expand_results), False)
+}
+
+
+# Mejor tiempo de `repeat` ejecuciones y pico de memoria (tracemalloc) de una ejecución aparte
+def measure(func, inputs, repeat):
+    seconds = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(inputs)
+        seconds = min(seconds, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func(inputs)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return seconds, peak / 2**20
+
+# Commit actual del repositorio (None si no es un repositorio de git)
+def current_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=Path(__file__).parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# Imprime la comparación contra un archivo de resultados anterior (tiempo y memoria relativos)
+def compare(results, baseline_path):
+    baseline = json.loads(Path(baseline_path).read_text(encoding='utf-8'))
+    previous = {(row['etapa'], row['filas']): row for row in baseline['resultados']}
+    print(f"\nComparación contra {baseline_path} (commit {baseline.get('commit')}):")
+    print(f"{'etapa':>16} {'filas':>9} {'tiempo':>9} {'memoria':>9}")
+    for row in results:
+        before = previous.get((row['etapa'], row['filas']))
+        if before is None:
+            continue
+        time_ratio = row['segundos'] / before['segundos'] if before['segundos'] else np.nan
+        memory_ratio = row['pico_mb'] / before['pico_mb'] if before['pico_mb'] else np.nan
+        print(f"{row['etapa']:>16} {row['filas']:>9,} {time_ratio:>8.2f}x {memory_ratio:>8.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mide cada etapa del pipeline de las páginas a varios tamaños de planilla.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 50_000])
+    parser.add_argument('--stages', nargs='+', choices=list(stages), default=list(stages))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--loop-limit', type=int, default=10_000,
+                        help="No ejecutar el recorrido con iterrows por encima de este número de operaciones.")
+    parser.add_argument('--output', type=Path, default=None,
+                        help="archivo JSON de resultados (por defecto benchmarks/results/<commit>.json)")
+    parser.add_argument('--compare', type=Path, default=None, help="archivo JSON anterior con el que comparar")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'etapa':>16} {'filas':>9} {'segundos':>10} {'pico (MB)':>10}")
+    for size in args.sizes:
+        inputs = prepare(size)
+        for name in args.stages:
+            func, is_loop = stages[name]
+            if is_loop and size > args.loop_limit:
+                continue
+            seconds, peak_mb = measure(func, inputs, args.repeat)
+            results.append({'etapa': name, 'filas': size, 'segundos': round(seconds, 6), 'pico_mb': round(peak_mb, 3)})
+            print(f"{name:>16} {size:>9,} {seconds:>10.4f} {peak_mb:>10.2f}")
+
+    commit = current_commit()
+    output = args.output or results_dir / f"{commit or 'sin-commit'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({
+        'commit': commit,
+        'fecha': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'repeticiones': args.repeat,
+        'resultados': results
+    }, ensure_ascii=False, indent=2), encoding='utf-8')
+    print(f"\nResultados guardados en {output}")
+
+    if args.compare is not None:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+from kpi import date_columns
+
+countries = ['ARGENTINA', 'BOLIVIA', 'BRASIL', 'PARAGUAY', 'URUGUAY']
+country_prefix = {'ARGENTINA': 'ARG', 'BOLIVIA': 'BOL', 'BRASIL': 'BRA', 'PARAGUAY': 'PAR', 'URUGUAY': 'URU'}
+
+# Proporción de fechas vacías por columna, similar a FECHAS.xlsx
+null_rates = {
+    'FechaCartaConsulta': 0.0,
+    'FechaAprobacion': 0.0,
+    'FechaVigencia': 0.02,
+    'FechaElegibilidad': 0.11,
+    'FechaPrimeDesembolso': 0.13
+}
+
+
+# Genera una planilla de operaciones con la forma de FECHAS.xlsx
+def make_operations(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    pais = rng.choice(countries, size=n_rows)
+    numbers = np.arange(n_rows)
+    data = pd.DataFrame({
+        'PAIS': pais,
+        'NO. OPERACION': [f"{country_prefix[p]}-{n:03d}" for p, n in zip(pais, numbers)],
+        'APODO': [f"Operación {n}" for n in numbers],
+    })
+
+    # Cada etapa ocurre entre 0 y ~18 meses después de la anterior
+    current = pd.Timestamp('2005-01-01') + pd.to_timedelta(rng.integers(0, 18 * 365, size=n_rows), unit='D')
+    for col in date_columns:
+        current = current + pd.to_timedelta(rng.integers(0, 540, size=n_rows), unit='D')
+        values = pd.Series(current)
+        values[rng.random(n_rows) < null_rates[col]] = pd.NaT
+        data[col] = values.to_numpy()
+    return data
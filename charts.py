@@ -0,0 +1,120 @@
+import hashlib
+import io
+
+import matplotlib.pyplot as plt
+import pandas as pd
+import seaborn as sns
+import streamlit as st
+
+from exports import frame_digest
+from labels import add_stacked_labels, add_value_labels
+from profiling import profiled
+
+# Paleta de colores para los países
+country_colors = {
+    "ARGENTINA": "#36A9E1",
+    "BOLIVIA": "#F39200",
+    "BRASIL": "#009640",
+    "PARAGUAY": "#E30613",
+    "URUGUAY": "#27348B"
+}
+
+# Número de gráficos renderizados distintos que se mantienen en memoria
+max_charts = 64
+
+# Resolución de los PNG, la misma que usa st.pyplot
+chart_dpi = 200
+
+
+# Gráfico de barras horizontales con el KPI promedio por país
+def draw_country_average(kpi_avg_by_country, figsize):
+    fig, ax = plt.subplots(figsize=figsize)
+
+    # Crear una lista de colores que coincida con el orden de los países en 'kpi_avg_by_country'
+    country_order = kpi_avg_by_country.index
+    country_palette = [country_colors.get(country, "#333333") for country in country_order]
+
+    # Dibujar el gráfico de barras con la paleta de colores específica
+    sns.barplot(x=kpi_avg_by_country.values, y=country_order, ax=ax, palette=country_palette)
+
+    # Agregar las etiquetas de valor
+    add_value_labels(ax)
+
+    fig.tight_layout()
+    return fig
+
+# Gráfico de barras horizontales con el conteo de estaciones por productividad
+def draw_productivity_counts(productivity_count, figsize):
+    fig, ax = plt.subplots(figsize=figsize)
+    sns.barplot(x=productivity_count.values, y=productivity_count.index, ax=ax, palette='Spectral')
+    add_value_labels(ax)
+    fig.tight_layout()
+    return fig
+
+# Gráfico de barras apiladas con el KPI promedio por año (filas) y país (columnas)
+def draw_stacked_by_year(kpi_by_year_country, figsize):
+    fig, ax = plt.subplots(figsize=figsize)
+    colors = [country_colors.get(country, "#333333") for country in kpi_by_year_country.columns]
+    kpi_by_year_country.plot(kind='bar', stacked=True, color=colors, ax=ax)
+
+    # Agregar etiquetas de valor a cada segmento de barra y un total en la parte superior
+    add_stacked_labels(ax, kpi_by_year_country, fontsize=9)
+
+    ax.set_ylabel('KPI Promedio')
+    ax.set_xlabel('Año')
+    ax.set_xticklabels([str(x) for x in kpi_by_year_country.index], rotation=0)
+    ax.legend(title='País', bbox_to_anchor=(1.05, 1), loc='upper left')
+    fig.tight_layout()
+    return fig
+
+# Gráfico de barras con el promedio de meses por año (Hello.py y la página de estaciones por país)
+def draw_year_months(data, x, y, title, figsize=(10, 6)):
+    fig, ax = plt.subplots(figsize=figsize)
+    data.plot(kind='bar', x=x, y=y, ax=ax, color='lightblue', legend=False)
+    ax.set_ylabel('Meses')
+    ax.set_xlabel('Año')
+    ax.set_title(title)
+    add_value_labels(ax, padding=2, rounded=True)
+    return fig
+
+# Histograma de los tiempos en meses con líneas en la mediana y el P90
+def draw_duration_histogram(histogram, median, p90, figsize):
+    fig, ax = plt.subplots(figsize=figsize)
+    width = histogram.index[1] - histogram.index[0] if len(histogram) > 1 else 1.0
+    ax.bar(histogram.index, histogram.to_numpy(), width=width, align='edge', color='lightblue', edgecolor='white')
+    for value, label, style in ((median, 'Mediana', '-'), (p90, 'P90', '--')):
+        if value == value:  # Sin líneas si no hay valores (NaN)
+            ax.axvline(value, color='#333333', linestyle=style, label=f'{label}: {value:.2f}')
+    ax.set_xlabel('Meses')
+    ax.set_ylabel('Estaciones')
+    if ax.get_legend_handles_labels()[0]:
+        ax.legend()
+    fig.tight_layout()
+    return fig
+
+
+# Función para convertir una figura a bytes PNG o SVG. La figura se cierra
+# siempre, de modo que pyplot no acumula figuras entre reruns.
+@profiled('rasterizar_grafico')
+def figure_bytes(fig, fmt='png'):
+    output = io.BytesIO()
+    try:
+        fig.savefig(output, format=fmt, dpi=chart_dpi, bbox_inches='tight')
+    finally:
+        plt.close(fig)
+    return output.getvalue()
+
+# Gráfico renderizado en caché, indexado por la función de dibujo, la huella de los datos y los parámetros
+@st.cache_data(max_entries=max_charts, show_spinner=False)
+def _cached_chart(key, _draw, _data, _args, fmt):
+    return figure_bytes(_draw(_data, *_args), fmt=fmt)
+
+# Devuelve los bytes (PNG por defecto, o SVG) del gráfico que dibuja `draw(data, *args)`.
+# Se dibuja y rasteriza una sola vez por combinación de datos y parámetros; los
+# reruns con los mismos agregados reutilizan la imagen sin crear figuras.
+@profiled('grafico')
+def render_chart(draw, data, *args, fmt='png'):
+    params = repr((draw.__name__, args, fmt, sns.axes_style(), sns.plotting_context()))
+    key = hashlib.sha256(params.encode('utf-8'))
+    key.update(frame_digest(pd.DataFrame(data), index=True).encode('utf-8'))
+    return _cached_chart(key.hexdigest(), draw, data, args, fmt)
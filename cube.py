@@ -0,0 +1,335 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from distributions import build_histograms, merge_histograms
+from durations import duration_months
+from ingest import chunk_rows, iter_workbook_chunks
+from kpi import get_first_word, operations, repeat_categorical, station_dates
+from productivity import classify, default_profile
+from profiling import profiled
+from sketches import build_sketches, distinct_count, hash_values, merge_sketches
+
+# Dimensiones del cubo: cada celda es una combinación distinta de estos valores.
+# Las celdas se guardan ordenadas en este orden (años vacíos al final), de modo
+# que un rango de años es un tramo contiguo que se ubica con dos búsquedas binarias.
+cube_dimensions = ['ANO', 'ESTACIONES', 'PAIS', 'TIPO_DE_KPI', 'Productividad']
+
+# Dimensiones de texto, guardadas como categóricas con las categorías ordenadas:
+# los filtros de país, estación y productividad comparan códigos enteros
+categorical_dimensions = cube_dimensions[1:]
+
+# Medidas disponibles: 'kpi' (meses redondeados, como la columna KPI) y
+# 'meses' (meses sin redondear y sin negativos, como las columnas Meses_* de Hello.py).
+# Las sumas se guardan en unidades enteras (centésimas de mes y centésimas de
+# día de un mes de 30 días) para que sean exactas sin importar el orden en que
+# se combinan las celdas; la escala convierte la suma de vuelta a meses.
+measure_scale = {'kpi': 100, 'meses': 3000}
+
+# Columnas aditivas de cada celda
+additive_columns = ['kpi_sum', 'kpi_count', 'meses_sum', 'meses_count', 'filas']
+
+
+# Función para asignar códigos enteros a las operaciones, estables entre tandas.
+# `index` es un diccionario operación -> código que se extiende con las nuevas;
+# las operaciones vacías reciben -1.
+def encode_operations(values, index):
+    values = pd.Series(values, dtype=object)
+    for value in pd.unique(values.dropna()):
+        if value not in index:
+            index[value] = len(index)
+    return values.map(index).fillna(-1).to_numpy(dtype='int64')
+
+
+# Tabla larga (operación x estación) con lo que necesita el cubo, sin clasificar:
+# dimensiones, medidas en unidades enteras y el código y el hash de la operación. No
+# depende de los umbrales, así que cambiar el perfil no recalcula fechas ni KPI.
+# `unit` es la unidad de duración de ambas medidas (ver durations.duration_units).
+@profiled('base_cubo')
+def cube_base(data, operation_index=None, unit='dias30'):
+    n_stations = len(operations)
+    names = list(operations)
+    starts, ends = station_dates(data)
+
+    countries = repeat_categorical(data['PAIS'], n_stations)
+    months = duration_months(starts, ends, unit=unit, countries=countries)
+    operation_codes = encode_operations(data['NO. OPERACION'], {} if operation_index is None else operation_index)
+
+    return pd.DataFrame({
+        'ANO': pd.Series(ends).dt.year.astype('float64'),
+        'PAIS': countries.to_numpy(dtype=object),
+        'ESTACIONES': np.tile(np.array([get_first_word(name) for name in names], dtype=object), len(data)),
+        'TIPO_DE_KPI': np.tile(np.array(names, dtype=object), len(data)),
+        'kpi': np.rint(np.round(months, 2) * measure_scale['kpi']),
+        'meses': np.rint(np.clip(months, 0, None) * measure_scale['meses']),
+        'operacion': np.repeat(operation_codes, n_stations),
+        'hash_operacion': np.repeat(hash_values(data['NO. OPERACION']), n_stations)
+    })
+
+# Clasifica la tabla de cube_base con el perfil de umbrales y la agrega en celdas.
+# Cada celda guarda suma y conteo de ambas medidas, el número de filas
+# (estaciones), los códigos enteros ordenados de las operaciones que contiene,
+# un bosquejo HyperLogLog de ellas (ver sketches.py) y el histograma, mínimo y
+# máximo del KPI (ver distributions.py), de modo que cualquier filtro se
+# responde sumando o uniendo celdas.
+@profiled('cubo')
+def aggregate_cube(base, profile=default_profile):
+    kpi = base['kpi'].to_numpy() / measure_scale['kpi']
+    frame = base.assign(Productividad=classify(kpi, base['PAIS'], base['ESTACIONES'], profile))
+
+    grouped = frame.groupby(cube_dimensions, dropna=False, sort=True)
+    cells = grouped.agg(
+        kpi_sum=('kpi', 'sum'),
+        kpi_count=('kpi', 'count'),
+        meses_sum=('meses', 'sum'),
+        meses_count=('meses', 'count'),
+        filas=('kpi', 'size'),
+        kpi_min=('kpi', 'min'),
+        kpi_max=('kpi', 'max')
+    )
+    cells['operaciones'] = grouped['operacion'].unique().map(lambda codes: np.sort(codes[codes >= 0]))
+    cell_ids = grouped.ngroup().to_numpy()
+    present = frame['operacion'].to_numpy() >= 0
+    cells['bosquejo'] = list(build_sketches(cell_ids[present], frame['hash_operacion'].to_numpy()[present], len(cells)))
+    cells['histograma'] = list(build_histograms(cell_ids, kpi, len(cells)))
+    return _index_cells(cells.reset_index())
+
+# Construye el cubo de agregados a partir de la planilla ancha de fechas. Para
+# construir el cubo por tandas se pasa el mismo `operation_index` a cada llamada.
+def build_cube(data, operation_index=None, profile=default_profile, unit='dias30'):
+    return aggregate_cube(cube_base(data, operation_index=operation_index, unit=unit), profile=profile)
+
+# Combina cubos construidos por separado (p. ej. por tandas): suma las columnas
+# aditivas y une las operaciones de las celdas con las mismas dimensiones.
+# `operations` combina las operaciones de las celdas que se juntan.
+def merge_cubes(cubes, operations=None):
+    cells = pd.concat(cubes, ignore_index=True)
+    for column in categorical_dimensions:
+        cells[column] = cells[column].astype(object)  # Categorías distintas en cada cubo
+    grouped = cells.groupby(cube_dimensions, dropna=False, sort=True)
+    merged = grouped[additive_columns].sum()
+    merged['operaciones'] = grouped['operaciones'].agg(operations or _union_operations)
+    merged['kpi_min'] = grouped['kpi_min'].min()
+    merged['kpi_max'] = grouped['kpi_max'].max()
+    merged['bosquejo'] = grouped['bosquejo'].agg(merge_sketches)
+    merged['histograma'] = grouped['histograma'].agg(merge_histograms)
+    return _index_cells(merged.reset_index())
+
+# Combina cubos sin celdas en común (p. ej. de países distintos): basta con
+# concatenarlos y ordenar las celdas como las deja el groupby de aggregate_cube
+def concat_cubes(cubes):
+    cells = pd.concat(cubes, ignore_index=True)
+    for column in categorical_dimensions:
+        cells[column] = cells[column].astype(object)
+    cells = cells.sort_values(cube_dimensions, na_position='last', kind='stable', ignore_index=True)
+    return _index_cells(cells)
+
+# Unión ordenada de los códigos de operación de varias celdas
+def _union_operations(codes):
+    return np.unique(np.concatenate(list(codes)))
+
+# Listas de arreglos de códigos de varias celdas, encadenadas sin copiar los arreglos
+def _chain_operations(arrays):
+    return [codes for cell_arrays in arrays for codes in cell_arrays]
+
+# Combina en orden cubos que llegan de a uno (tandas o planillas). Las columnas
+# de tamaño fijo (sumas, bosquejos, histogramas) se combinan con el acumulado a
+# medida que llega cada cubo; los códigos de operación de cada celda se juntan
+# en una lista, un arreglo por cubo, y se unen una sola vez al final, en lugar
+# de volver a ordenar en cada paso todos los códigos reunidos hasta ese momento.
+def accumulate_cubes(cubes):
+    cube = None
+    for part in cubes:
+        if part is not None:
+            part = part.assign(operaciones=part['operaciones'].map(lambda codes: [codes]))
+            cube = part if cube is None else merge_cubes([cube, part], operations=_chain_operations)
+        part = None  # No retener el cubo combinado mientras se calcula el siguiente
+    if cube is not None:
+        cube['operaciones'] = cube['operaciones'].map(_union_operations)
+    return cube
+
+# Pasa las dimensiones de texto a categóricas. Las celdas ya vienen ordenadas por
+# cube_dimensions del groupby, y las categorías ordenadas mantienen ese orden.
+def _index_cells(cells):
+    for column in categorical_dimensions:
+        cells[column] = pd.Categorical(cells[column], categories=np.sort(cells[column].dropna().unique()))
+    return cells
+
+# Construye el cubo a partir de tandas de filas (ver ingest.iter_workbook_chunks),
+# combinando cada tanda con el acumulado (ver accumulate_cubes). Todo se hace en
+# memoria, pero nunca con más de una tanda de la planilla a la vez: la memoria
+# depende del tamaño de la tanda, del número de celdas y del número de
+# operaciones distintas (sus códigos en las celdas y `operation_index`), no del
+# número de filas. `operation_index` recibe los códigos asignados a cada operación.
+@profiled('cubo_por_tandas')
+def build_cube_streaming(chunks, profile=default_profile, unit='dias30', operation_index=None):
+    operation_index = {} if operation_index is None else operation_index
+    return accumulate_cubes(build_cube(chunk, operation_index=operation_index, profile=profile, unit=unit)
+                            for chunk in chunks)
+
+# Cubo de una planilla (contenido o ruta del .xlsx) leída por tandas de
+# `chunk_size` filas, con los códigos locales de sus operaciones. Se ejecuta en
+# un proceso del pool.
+def workbook_cube(source, profile=default_profile, unit='dias30', chunk_size=chunk_rows):
+    content = source.read_bytes() if isinstance(source, Path) else source
+    operation_index = {}
+    cube = build_cube_streaming(iter_workbook_chunks(content, chunk_size), profile=profile, unit=unit,
+                                operation_index=operation_index)
+    return cube, list(operation_index)
+
+# Pasa los códigos de operación locales de un cubo (`labels[código]` es la
+# operación) a los códigos de `index`, que se extiende con las operaciones nuevas
+def recode_operations(cube, labels, index):
+    mapping = encode_operations(labels, index)
+    return cube.assign(operaciones=cube['operaciones'].map(lambda codes: np.sort(mapping[codes])))
+
+# Cubo combinado de varias planillas. Cada planilla se lee por tandas de
+# `chunk_size` filas en un proceso aparte y devuelve solo su cubo; aquí se
+# unifican los códigos de operación y se combinan los cubos, en el orden de
+# `sources` para que el resultado no dependa de qué proceso termina primero. Ni
+# la tabla larga ni las planillas completas llegan a estar en memoria (nada se
+# escribe a disco): el costo depende del tamaño de la tanda por proceso, del
+# número de celdas y del número de operaciones distintas. Con `on_error`, una
+# planilla que no se puede leer se informa con on_error(planilla, error) y se
+# omite; sin él, el error se propaga.
+@profiled('cubo_planillas')
+def build_cube_workbooks(sources, profile=default_profile, unit='dias30', workers=None, chunk_size=chunk_rows,
+                         on_error=None):
+    workers = min(workers or os.cpu_count() or 1, len(sources))
+    options = (profile, unit, chunk_size, on_error is not None)
+    if workers <= 1:
+        return _merge_workbook_cubes(sources, (_try_workbook_cube(source, *options) for source in sources), on_error)
+    # 'spawn': los procesos no heredan los hilos del servidor de Streamlit
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        results = pool.map(_try_workbook_cube, sources, *[[option] * len(sources) for option in options])
+        return _merge_workbook_cubes(sources, results, on_error)
+
+# workbook_cube que, con `skip_errors`, devuelve el error en lugar de propagarlo:
+# (cubo, operaciones, error)
+def _try_workbook_cube(source, profile, unit, chunk_size, skip_errors):
+    try:
+        return workbook_cube(source, profile, unit, chunk_size) + (None,)
+    except Exception as error:
+        if not skip_errors:
+            raise
+        return None, [], error
+
+# Combina los cubos de cada planilla, en orden, con el acumulado. Las planillas
+# sin filas no tienen cubo.
+def _merge_workbook_cubes(sources, results, on_error):
+    return accumulate_cubes(_recoded_cubes(sources, results, on_error, {}))
+
+# Cubos de cada planilla con los códigos de `operation_index`
+def _recoded_cubes(sources, results, on_error, operation_index):
+    for source in sources:
+        part, labels, error = next(results)
+        if error is not None:
+            on_error(source, error)
+        elif part is not None:
+            part = recode_operations(part, labels, operation_index)
+        yield part
+        part = labels = None  # No retener el cubo mientras se calcula el de la siguiente planilla
+
+# Selecciona las celdas que cumplen los filtros. `years` es un rango (mínimo, máximo)
+# inclusivo; el resto son colecciones de valores aceptados. None no filtra.
+# Las celdas deben estar ordenadas por año, como las deja el cubo (un filtro
+# conserva el orden): el rango de años es un tramo de filas sin copiar, y los
+# demás filtros comparan los códigos de las dimensiones categóricas.
+def slice_cube(cells, years=None, countries=None, stations=None, productivity=None):
+    if years is not None:
+        cells = cells.iloc[slice(*year_bounds(cells, years))]
+    mask = None
+    for column, values in (('PAIS', countries), ('ESTACIONES', stations), ('Productividad', productivity)):
+        if values is not None:
+            matches = code_mask(cells[column], values)
+            mask = matches if mask is None else mask & matches
+    return cells if mask is None else cells[mask]
+
+# Posiciones [inicio, fin) de las celdas con año en el rango inclusivo `years`,
+# con dos búsquedas binarias sobre la columna ANO ordenada (NaN queda al final)
+def year_bounds(cells, years):
+    values = cells['ANO'].to_numpy()
+    return int(np.searchsorted(values, years[0], side='left')), int(np.searchsorted(values, years[1], side='right'))
+
+# Filas de una columna categórica cuyo valor está en `values`, comparando códigos:
+# una tabla de búsqueda por código (el código -1, vacío, cae en la última entrada)
+def code_mask(column, values):
+    categorical = column.array
+    accepted = np.zeros(len(categorical.categories) + 1, dtype=bool)
+    wanted = set(values)
+    accepted[:-1] = [category in wanted for category in categorical.categories]
+    return accepted[categorical.codes]
+
+# Promedio de una medida sobre las celdas seleccionadas (NaN si no hay valores)
+def cube_mean(cells, measure='kpi', decimals=None):
+    count = cells[f'{measure}_count'].sum()
+    if not count:
+        return np.nan
+    return float(_mean(np.array([cells[f'{measure}_sum'].sum()]), np.array([count]), measure, decimals)[0])
+
+# Número de filas (estaciones) de las celdas seleccionadas
+def cube_rows(cells):
+    return int(cells['filas'].sum())
+
+# Número de operaciones distintas en las celdas seleccionadas: exacto en
+# selecciones pequeñas y estimado con los bosquejos en las grandes
+def cube_distinct(cells):
+    return distinct_count(cells['operaciones'], cells['bosquejo'])
+
+# Agrega las celdas por una o más dimensiones: promedio de la medida, filas y
+# operaciones distintas por grupo. Los grupos sin valores de la medida se omiten.
+# Con `decimals` el promedio se redondea (ver _mean).
+def cube_group(cells, by, measure='kpi', decimals=None):
+    cells = cells[cells[f'{measure}_count'] > 0]
+    grouped = cells.groupby(by, sort=True)
+    result = grouped[[f'{measure}_sum', f'{measure}_count', 'filas']].sum()
+    result['promedio'] = _mean(result[f'{measure}_sum'].to_numpy(), result[f'{measure}_count'].to_numpy(),
+                               measure, decimals)
+    result['operaciones'] = [distinct_count(group['operaciones'], group['bosquejo']) for _, group in grouped]
+    return _plain_labels(result)
+
+# Equivalente de pivot_table(values=..., index=..., columns=..., aggfunc='mean') sobre el cubo
+def cube_pivot_mean(cells, index, columns, measure='kpi', decimals=None):
+    grouped = cube_group(cells, [index, columns], measure=measure, decimals=decimals)
+    pivot = grouped['promedio'].unstack(columns)
+    pivot.columns.name = columns
+    return pivot
+
+# Equivalente de value_counts sobre una dimensión, en número de filas
+def cube_counts(cells, by):
+    return _plain_labels(cells.groupby(by, sort=True)['filas'].sum().loc[lambda counts: counts > 0])
+
+# Promedio de una medida a partir de las sumas enteras y los conteos de las
+# celdas, en meses. Con `decimals` se redondea el cociente exacto con aritmética
+# entera, con las mitades al par como round: el resultado no depende del orden en
+# que se sumaron las celdas. pivot_table(...).round(2) sobre la tabla larga
+# promedia los valores en coma flotante y su resultado en un empate exacto
+# (p. ej. 13,435) depende del orden en que se suman las filas, que el cubo no
+# conserva: ahí puede diferir en 10**-decimals (ver CHANGELOG.md).
+def _mean(sums, counts, measure, decimals=None):
+    if decimals is None:
+        return sums / counts / measure_scale[measure]
+    numerators = np.rint(sums).astype(np.int64) * 10**decimals
+    denominators = np.asarray(counts, dtype=np.int64) * measure_scale[measure]
+    quotients, remainders = np.divmod(numerators, denominators)
+    twice = 2 * remainders
+    quotients += (twice > denominators) | ((twice == denominators) & (quotients % 2 == 1))
+    return quotients / 10**decimals
+
+# Etiquetas de los grupos como valores simples en lugar de categóricas, para que
+# los gráficos y tablas respeten el orden del resultado y no el de las categorías
+def _plain_labels(result):
+    index = result.index
+    if isinstance(index, pd.MultiIndex):
+        result.index = index.set_levels([_plain_level(level) for level in index.levels])
+    else:
+        result.index = _plain_level(index)
+    return result
+
+# Un nivel de índice categórico como índice de sus valores
+def _plain_level(level):
+    return level.astype(level.categories.dtype) if isinstance(level, pd.CategoricalIndex) else level
@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+
+# Histograma de cada celda del cubo: clases de `histogram_width` meses entre 0 y
+# `histogram_limit` meses, más una clase para los valores negativos (primera) y
+# otra para los mayores al límite (última). Los histogramas se combinan sumando,
+# así que cualquier selección de celdas tiene su distribución exacta por clases,
+# y un percentil tiene un error menor que el ancho de una clase.
+histogram_width = 0.1
+histogram_limit = 120.0
+histogram_bins = int(round(histogram_limit / histogram_width)) + 2
+
+# Percentiles que se informan junto al promedio
+quantile_levels = {'Mediana': 0.5, 'P75': 0.75, 'P90': 0.9, 'P95': 0.95}
+
+
+# Clase del histograma de cada valor en meses (NaN no tiene clase: -1)
+def histogram_classes(months):
+    months = np.asarray(months, dtype='float64')
+    classes = np.floor(months / histogram_width + 1e-9) + 1  # Tolerancia para los bordes (p. ej. 0,3 / 0,1)
+    classes = np.clip(classes, 0, histogram_bins - 1)
+    return np.where(np.isnan(months), -1, classes).astype(np.intp)
+
+# Histogramas de varios grupos a la vez: fila g = conteos por clase de los
+# valores del grupo g (`groups`, de 0 a n_groups - 1). Los NaN no se cuentan.
+def build_histograms(groups, months, n_groups):
+    classes = histogram_classes(months)
+    present = classes >= 0
+    flat = np.asarray(groups, dtype=np.intp)[present] * histogram_bins + classes[present]
+    counts = np.bincount(flat, minlength=n_groups * histogram_bins)
+    return counts.reshape(n_groups, histogram_bins).astype(np.uint32)
+
+# Unión de histogramas: la suma de los conteos
+def merge_histograms(histograms):
+    histograms = list(histograms)
+    if not histograms:
+        return np.zeros(histogram_bins, dtype=np.uint32)
+    return np.sum(np.stack(histograms), axis=0, dtype=np.uint32)
+
+# Percentiles (fracciones entre 0 y 1) de un histograma, interpolando dentro de
+# la clase. En las clases abiertas (negativos y mayores al límite) se interpola
+# entre el mínimo o el máximo de los valores y el borde del rango. NaN si está vacío.
+def histogram_quantiles(histogram, levels, low, high):
+    total = int(histogram.sum())
+    if total == 0:
+        return np.full(len(levels), np.nan)
+    edges = np.concatenate([[min(low, 0.0)], np.arange(histogram_bins - 1) * histogram_width,
+                            [max(high, histogram_limit)]])
+    cumulative = np.cumsum(histogram)
+    quantiles = []
+    for level in levels:
+        position = level * total
+        index = min(int(np.searchsorted(cumulative, position, side='left')), histogram_bins - 1)
+        before = cumulative[index - 1] if index else 0
+        fraction = (position - before) / histogram[index] if histogram[index] else 0.0
+        quantiles.append(edges[index] + fraction * (edges[index + 1] - edges[index]))
+    # Sin salir del rango observado
+    return np.clip(quantiles, low, high)
+
+
+# Promedio, percentiles y cantidad de valores de las celdas seleccionadas, por
+# grupo de una o más dimensiones (None: una sola fila con toda la selección).
+# `scale` convierte las sumas, mínimos y máximos de las celdas a meses.
+def distribution_table(cells, by=None, scale=100):
+    cells = cells[cells['kpi_count'] > 0]
+    groups = [(None, cells)] if by is None else cells.groupby(by, sort=True, observed=True)
+    rows = []
+    for key, group in groups:
+        histogram = merge_histograms(group['histograma'])
+        quantiles = histogram_quantiles(histogram, list(quantile_levels.values()),
+                                        group['kpi_min'].min() / scale, group['kpi_max'].max() / scale)
+        row = {} if by is None else dict(zip([by] if isinstance(by, str) else by, key if isinstance(key, tuple) else (key,)))
+        row['Valores'] = int(group['kpi_count'].sum())
+        row['Promedio'] = group['kpi_sum'].sum() / group['kpi_count'].sum() / scale
+        row.update(zip(quantile_levels, quantiles))
+        rows.append(row)
+    table = pd.DataFrame(rows, columns=([] if by is None else [by] if isinstance(by, str) else list(by))
+                         + ['Valores', 'Promedio'] + list(quantile_levels))
+    return table.round({name: 2 for name in ['Promedio', *quantile_levels]})
+
+# Histograma de las celdas seleccionadas en clases de `width` meses, entre 0 y el
+# percentil `upper` (los valores mayores se acumulan en la última clase y los
+# negativos en la primera). Serie indexada por el inicio de cada clase.
+def histogram_series(cells, width=1.0, upper=0.99, scale=100):
+    histogram = merge_histograms(cells['histograma'])
+    if histogram.sum() == 0:
+        return pd.Series(dtype='int64', name='Estaciones')
+    high = float(histogram_quantiles(histogram, [upper], cells['kpi_min'].min() / scale, cells['kpi_max'].max() / scale)[0])
+    step = max(int(round(width / histogram_width)), 1)
+    last = max(int(np.ceil(high / width)), 1)
+    counts = np.zeros(last, dtype='int64')
+    inner = histogram[1:-1]
+    positions = np.minimum(np.arange(len(inner)) // step, last - 1)
+    np.add.at(counts, positions, inner)
+    counts[0] += histogram[0]
+    counts[-1] += histogram[-1]
+    return pd.Series(counts, index=pd.Index(np.arange(last) * width, name='Meses'), name='Estaciones')
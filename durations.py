@@ -0,0 +1,185 @@
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Unidades de duración disponibles. Todas se expresan en meses para que los
+# umbrales de productividad sigan valiendo en cualquier modo.
+duration_units = {
+    'dias30': "Días / 30",
+    'calendario': "Meses calendario exactos",
+    'habiles': "Días hábiles (sin feriados del país)"
+}
+
+# Días hábiles (lunes a viernes) de un mes promedio: 365,25 * 5 / 7 / 12
+business_days_per_month = 365.25 * 5 / 7 / 12
+
+# Feriados nacionales de fecha fija: (mes, día) o (mes, día, desde el año)
+fixed_holidays = {
+    'ARGENTINA': [(1, 1), (3, 24), (4, 2), (5, 1), (5, 25), (6, 17), (6, 20), (7, 9), (8, 17),
+                  (10, 12), (11, 20), (12, 8), (12, 25)],
+    'BOLIVIA': [(1, 1), (1, 22, 2010), (5, 1), (6, 21, 2010), (8, 6), (11, 2), (12, 25)],
+    'BRASIL': [(1, 1), (4, 21), (5, 1), (9, 7), (10, 12), (11, 2), (11, 15), (11, 20, 2024), (12, 25)],
+    'PARAGUAY': [(1, 1), (3, 1), (5, 1), (5, 14), (5, 15), (6, 12), (8, 15), (9, 29), (12, 8), (12, 25)],
+    'URUGUAY': [(1, 1), (1, 6), (4, 19), (5, 1), (5, 18), (6, 19), (7, 18), (8, 25), (10, 12),
+                (11, 2), (12, 25)]
+}
+
+# Feriados móviles, en días respecto del domingo de Pascua: carnaval (-48, -47),
+# jueves santo (-3), viernes santo (-2) y Corpus Christi (+60)
+easter_holidays = {
+    'ARGENTINA': [-48, -47, -2],
+    'BOLIVIA': [-48, -47, -2, 60],
+    'BRASIL': [-48, -47, -2, 60],
+    'PARAGUAY': [-3, -2],
+    'URUGUAY': [-48, -47, -3, -2]
+}
+
+
+# Domingo de Pascua de cada año (algoritmo gregoriano anónimo), como datetime64[D]
+def easter_dates(years):
+    y = np.asarray(years, dtype='int64')
+    a, b, c = y % 19, y // 100, y % 100
+    d, e = b // 4, b % 4
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 19 * l) // 433
+    month = (h + l - 7 * m + 90) // 25
+    day = (h + l - 7 * m + 33 * month + 19) % 32
+    return _make_dates(y, month, day)
+
+# Fechas datetime64[D] a partir de arreglos de año, mes y día
+def _make_dates(years, months, days):
+    months = (np.asarray(years, dtype='int64') - 1970) * 12 + np.asarray(months, dtype='int64') - 1
+    return months.astype('datetime64[M]').astype('datetime64[D]') + (np.asarray(days, dtype='int64') - 1)
+
+# Feriados de un país entre dos años (inclusive), ordenados, como datetime64[D]
+def country_holidays(country, first_year, last_year):
+    years = np.arange(first_year, last_year + 1)
+    dates = [_make_dates(years[years >= (rule[2] if len(rule) > 2 else years[0])], rule[0], rule[1])
+             for rule in fixed_holidays.get(country, [])]
+    easter = easter_dates(years)
+    dates += [easter + offset for offset in easter_holidays.get(country, [])]
+    return np.unique(np.concatenate(dates)) if dates else np.array([], dtype='datetime64[D]')
+
+# Calendario de días hábiles de un país (lunes a viernes sin sus feriados). Se
+# arma una vez por país y rango de años.
+@lru_cache(maxsize=32)
+def business_calendar(country, first_year, last_year):
+    return np.busdaycalendar(weekmask='1111100', holidays=country_holidays(country, first_year, last_year))
+
+# Tabla de días hábiles acumulados: fila i = país i de `countries` (la última fila,
+# sin feriados, para las filas sin país), columna j = días hábiles desde `first`
+# hasta el día first + j (exclusive). Los días hábiles entre dos fechas son la
+# resta de dos entradas de la tabla, como np.busday_count. Se guarda aplanada
+# (fila tras fila) y se arma una vez por países y rango de días.
+@lru_cache(maxsize=8)
+def business_day_table(countries, first, last):
+    days = np.arange(first, last + 2).astype('datetime64[D]')
+    years = days[[0, -1]].astype('datetime64[Y]').astype('int64') + 1970
+    table = np.zeros((len(countries) + 1, len(days)), dtype='int32')
+    for row, country in enumerate(list(countries) + [None]):
+        calendar = business_calendar(country, int(years[0]), int(years[1]))
+        np.cumsum(np.is_busday(days[:-1], busdaycal=calendar), out=table[row, 1:])
+    return table.ravel()
+
+# Tablas de meses calendario para días enteros entre `first` y `last` (posición
+# j = día first + j): el mes de cada día (meses desde el del día first), su día
+# del mes (desde 0) y `partial`, donde partial[d * n + j] es el resultado de
+# _calendar_months más el mes del inicio, para un inicio en el día d del mes
+# (0 a 30) y el fin en la posición j. Sumar meses a un inicio solo depende de su
+# día del mes, así que cada par de fechas se resuelve con tres búsquedas en las
+# tablas. Se arman una vez por rango de días.
+@lru_cache(maxsize=8)
+def calendar_tables(first, last):
+    days = np.arange(first, last + 1)
+    month_of_day = days.astype('datetime64[D]').astype('datetime64[M]').astype('int64')
+    month_start = np.arange(month_of_day[0] - 1, month_of_day[-1] + 3).astype('datetime64[M]').astype('datetime64[D]')
+    month_length = np.diff(month_start.astype('int64'))
+    month_of_day -= month_of_day[0]
+    month = month_of_day + 1  # Posición en month_length del mes de cada día
+    day_of_month = days - month_start.astype('int64')[month]
+    previous_length, length, next_length = month_length[month - 1], month_length[month], month_length[month + 1]
+
+    # Fecha de fin h con inicio el día d del mes: se cuentan los meses hasta el
+    # mes de h y se vuelve uno atrás si sumarlos al inicio pasa de h
+    start_day = np.arange(31)[:, None]
+    offset = np.minimum(start_day, length - 1)
+    back = offset > day_of_month
+    month_start_day = np.arange(len(days)) - day_of_month
+    anchor = np.where(back, month_start_day - previous_length + np.minimum(start_day, previous_length - 1),
+                      month_start_day + offset)
+    after = np.where(back, month_start_day + offset, month_start_day + length + np.minimum(start_day, next_length - 1))
+    partial = (month_of_day - back) + (np.arange(len(days)) - anchor) / (after - anchor)
+    return month_of_day, day_of_month, partial.ravel()
+
+
+# Meses calendario exactos entre inicio y fin (días enteros): los meses completos
+# más la fracción transcurrida del mes siguiente, en días de ese mes. Si el día
+# no existe en el mes de destino se usa el último día de ese mes (31/01 + 1 mes =
+# 28/02 o 29/02). Negativo si el fin es anterior.
+def _calendar_months(starts, ends):
+    sign = np.where(ends < starts, -1.0, 1.0)
+    low, high = np.minimum(starts, ends), np.maximum(starts, ends)
+    first, last = _year_range(low.min(), high.max())
+    month_of_day, day_of_month, partial = calendar_tables(first, last)
+    low -= first
+    high -= first
+    return sign * (partial[day_of_month[low] * len(month_of_day) + high] - month_of_day[low])
+
+# Días hábiles entre inicio y fin (días enteros) con el calendario del país de
+# cada fila; sin país, solo lunes a viernes. Como np.busday_count: se cuenta el
+# inicio y no el fin, y es negativo si el fin es anterior.
+def _business_days(starts, ends, countries):
+    if len(starts) == 0:
+        return np.zeros(0)
+    first, last = _year_range(min(starts.min(), ends.min()), max(starts.max(), ends.max()))
+    table = business_day_table(tuple(countries.categories), first, last)
+    # Posición de la fila del país de cada fila en la tabla aplanada (el código
+    # -1, sin país, va a la última fila, sin feriados)
+    codes = countries.codes.astype(np.intp)
+    codes[codes < 0] = len(countries.categories)
+    rows = codes * (last - first + 2) - first
+    return (table[rows + ends] - table[rows + starts]).astype('float64')
+
+# Primer día del año de `first` y último del año de `last` (días desde 1970): las
+# tablas cubren años enteros, así que otra selección con fechas en los mismos
+# años reutiliza las del caché
+def _year_range(first, last):
+    years = np.array([first, last]).astype('datetime64[D]').astype('datetime64[Y]')
+    bounds = (years + np.array([0, 1])).astype('datetime64[D]').astype('int64')
+    return int(bounds[0]), int(bounds[1]) - 1
+
+# Días desde 1970 de cada fecha datetime64[ns], sin la hora (división entera
+# hacia abajo, como astype('datetime64[D]'))
+def _whole_days(dates):
+    return dates.view('int64') // 86_400_000_000_000
+
+
+# Duración en meses entre `starts` y `ends` (arreglos de fechas alineados) en la
+# unidad elegida, NaN si falta alguna de las dos fechas. `countries` (uno por
+# fila) solo se usa en el modo de días hábiles; si ya es un pd.Categorical se
+# usan sus códigos sin volver a factorizar.
+#
+# En días / 30 los días son los días enteros de la diferencia con su hora, como
+# (fin - inicio).days: 10/01 08:00 - 01/01 20:00 son 8 días, no 9. Los meses
+# calendario y los días hábiles cuentan fechas, así que ahí se descarta la hora.
+def duration_months(starts, ends, unit='dias30', countries=None):
+    starts = np.asarray(starts, dtype='datetime64[ns]')
+    ends = np.asarray(ends, dtype='datetime64[ns]')
+    months = np.full(len(starts), np.nan)
+    present = ~(np.isnat(starts) | np.isnat(ends))
+    starts = starts[present]
+    ends = ends[present]
+    if unit == 'dias30':
+        months[present] = (ends - starts) // np.timedelta64(1, 'D') / 30
+    elif unit == 'calendario':
+        months[present] = _calendar_months(_whole_days(starts), _whole_days(ends)) if len(starts) else []
+    elif unit == 'habiles':
+        countries = pd.Categorical(np.full(len(present), None) if countries is None else countries)
+        months[present] = _business_days(_whole_days(starts), _whole_days(ends), countries[present]) / business_days_per_month
+    else:
+        raise ValueError(f"Unidad de duración desconocida: {unit!r}")
+    return months
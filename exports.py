@@ -0,0 +1,79 @@
+import hashlib
+import io
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+
+from profiling import profiled
+
+# Tipo MIME de los archivos .xlsx para st.download_button
+xlsx_mime = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Número de filas que se convierten a valores de Python por tanda al escribir
+chunk_rows = 50_000
+
+# Número de archivos exportados distintos que se mantienen en memoria
+max_exports = 8
+
+
+# Función para obtener la huella del contenido de un DataFrame (columnas, tipos, índice y valores)
+def frame_digest(df, index=False):
+    digest = hashlib.sha256(repr((list(df.columns), [str(dtype) for dtype in df.dtypes], index)).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(df, index=index).to_numpy().tobytes())
+    return digest.hexdigest()
+
+# Convierte una tanda de filas a listas de valores que openpyxl puede escribir (NaN/NaT como celdas vacías)
+def _chunk_rows(df, index):
+    columns = [df.index] if index else []
+    columns += [df.iloc[:, position] for position in range(df.shape[1])]
+    values = []
+    for column in columns:
+        column = pd.Series(column)
+        as_object = column.astype(object).where(column.notna(), None).to_numpy()
+        values.append([value.item() if isinstance(value, np.generic) else value for value in as_object])
+    return zip(*values)
+
+# Función para convertir un DataFrame a los bytes de un archivo de Excel.
+# Usa el modo de solo escritura de openpyxl, que vuelca las filas a disco a
+# medida que se agregan, y convierte las filas por tandas de `chunk_rows`,
+# de modo que la memoria no crece con el tamaño del resultado. `transform`, si se
+# pasa, convierte cada tanda antes de escribirla sin cambiar sus columnas (p. ej.
+# kpi.expand_results, que formatea las fechas de la tabla larga solo al exportar).
+@profiled('exportar_excel')
+def excel_bytes(df, index=False, transform=None):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+
+    header = ([df.index.name or ''] if index else []) + list(df.columns)
+    cells = []
+    for label in header:
+        label = label.item() if isinstance(label, np.generic) else label
+        cell = WriteOnlyCell(sheet, value=label if isinstance(label, (str, int, float)) else str(label))
+        cell.font = Font(bold=True)
+        cells.append(cell)
+    sheet.append(cells)
+
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        for row in _chunk_rows(chunk if transform is None else transform(chunk), index):
+            sheet.append(row)
+
+    output = io.BytesIO()
+    workbook.save(output)
+    return output.getvalue()
+
+# Exportación en caché indexada por la huella del contenido del DataFrame y la transformación
+@st.cache_data(max_entries=max_exports, show_spinner=False)
+def _cached_excel_bytes(digest, _df, index, transform_name, _transform):
+    return excel_bytes(_df, index=index, transform=_transform)
+
+# Devuelve una función sin argumentos para st.download_button: el archivo de
+# Excel se genera recién cuando el usuario pide la descarga y se reutiliza
+# mientras el contenido del DataFrame no cambie.
+def lazy_excel(df, index=False, transform=None):
+    transform_name = None if transform is None else f'{transform.__module__}.{transform.__qualname__}'
+    return lambda: _cached_excel_bytes(frame_digest(df, index=index), df, index, transform_name, transform)
@@ -0,0 +1,71 @@
+import hashlib
+import io
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from kpi import date_columns
+from profiling import profiled
+from snapshot import load_snapshot, write_snapshot
+
+# Filas por tanda en la lectura por tandas de planillas grandes
+chunk_rows = 50_000
+
+
+# Función para obtener la huella (SHA-256) del contenido de un archivo subido
+def file_digest(content):
+    return hashlib.sha256(content).hexdigest()
+
+# Función para leer la planilla con openpyxl, sin transformar sus columnas
+@profiled('read_excel')
+def read_workbook(content):
+    return pd.read_excel(io.BytesIO(content))
+
+# Función para convertir las columnas Fecha* a datetime (las que ya lo son no se tocan).
+# No copia la planilla: con Copy-on-Write la nueva comparte las columnas que no
+# cambian (p. ej. las mapeadas en memoria de una instantánea) y solo se asignan
+# las convertidas.
+@profiled('to_datetime')
+def normalize_dates(data):
+    converted = {}
+    for col in date_columns:
+        if col in data.columns and not pd.api.types.is_datetime64_any_dtype(data[col]):
+            values = data[col].astype(object) if isinstance(data[col].dtype, pd.CategoricalDtype) else data[col]
+            converted[col] = pd.to_datetime(values, errors='coerce')
+    return data.assign(**converted)
+
+# Lee la planilla tal cual viene. Primero se busca una instantánea columnar en
+# disco con la misma huella; si no existe se lee el .xlsx y se guarda la
+# instantánea para las próximas aperturas.
+def read_raw(digest, content):
+    data = load_snapshot(digest)
+    if data is None:
+        data = read_workbook(content)
+        try:
+            write_snapshot(digest, data)
+        except (OSError, ValueError):
+            pass  # Sin caché en disco (p. ej. solo lectura) o con columnas de tipos mezclados se sigue sin instantánea
+    return data
+
+# Lee la primera hoja de la planilla por tandas de `chunk_size` filas con el modo
+# de solo lectura de openpyxl y entrega cada tanda ya con las fechas normalizadas.
+# Solo la tanda actual se mantiene en memoria como DataFrame.
+def iter_workbook_chunks(content, chunk_size=chunk_rows):
+    workbook = load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        buffer = []
+        for row in rows:
+            if all(value is None for value in row):
+                continue  # pd.read_excel también descarta las filas vacías
+            buffer.append(row)
+            if len(buffer) == chunk_size:
+                yield normalize_dates(pd.DataFrame(buffer, columns=header))
+                buffer = []
+        if buffer:
+            yield normalize_dates(pd.DataFrame(buffer, columns=header))
+    finally:
+        workbook.close()
@@ -0,0 +1,99 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from profiling import profiled
+
+# Número de índices de claves distintos que se mantienen en memoria
+max_key_indexes = 8
+
+
+# Normaliza una columna de claves: texto sin guiones ('AR-L1234' -> 'ARL1234'),
+# números enteros sin decimales (123 y 123.0 -> '123'; Excel lee como float las
+# columnas numéricas con celdas vacías), vacías como NaN
+def normalize_keys(values):
+    values = pd.Series(values)
+    keys = values.astype(str)
+    if values.dtype == object:
+        # Solo los números: el texto ('0123') y los booleanos quedan como están
+        numbers = pd.to_numeric(values.where(~values.map(lambda value: isinstance(value, (str, bool, np.bool_)))),
+                                errors='coerce')
+    elif pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        numbers = values
+    else:
+        numbers = None
+    if numbers is not None:
+        integral = numbers.notna() & (numbers % 1 == 0)
+        keys[integral] = numbers[integral].astype('Int64').astype(str)
+    return values.where(values.isna(), keys.str.replace('-', '', regex=False))
+
+
+# Índice de las claves de una tabla: posición de cada clave y cuántas están repetidas
+def build_key_index(keys):
+    index = pd.Index(normalize_keys(keys).to_numpy(dtype=object))
+    return {'index': index, 'unique': index.is_unique, 'duplicates': int(index.duplicated().sum())}
+
+@st.cache_resource(max_entries=max_key_indexes, show_spinner=False)
+def _cached_key_index(digest, _keys):
+    return build_key_index(_keys)
+
+# Índice de claves reutilizable entre reruns mientras el contenido de la columna no cambie
+def load_key_index(keys):
+    digest = hashlib.sha256(pd.util.hash_pandas_object(pd.Series(keys), index=False).to_numpy().tobytes()).hexdigest()
+    return _cached_key_index(digest, keys)
+
+
+# Nombre que tendrá cada columna después de pd.merge(left, right, on=on): las
+# columnas presentes en ambas tablas (salvo la clave) reciben los sufijos _x / _y
+def _output_names(left_columns, right_columns, on):
+    overlap = (set(left_columns) & set(right_columns)) - {on}
+    left_names = {column: f'{column}_x' if column in overlap else column for column in left_columns}
+    right_names = {column: f'{column}_y' if column in overlap else column for column in right_columns}
+    return left_names, right_names
+
+
+# Unión izquierda por `on` equivalente a pd.merge(left, right, on=on, how='left')
+# seguida de quedarse con las columnas `keep`, pero proyectando cada tabla a las
+# columnas necesarias antes de unir. Las claves de ambos lados se normalizan
+# (sin guiones) y las de la derecha se buscan en un índice reutilizable. Si la
+# derecha tiene claves repetidas, cada fila de la izquierda se multiplica por
+# sus coincidencias, como en pd.merge, y el informe lo señala.
+# Devuelve (DataFrame, informe).
+@profiled('join')
+def indexed_left_join(left, right, on, keep, name=''):
+    left_names, right_names = _output_names(left.columns, right.columns, on)
+    keep = set(keep) | {on}
+    left_columns = [column for column in left.columns if left_names[column] in keep]
+    right_columns = [column for column in right.columns if column != on and right_names[column] in keep]
+
+    left_part = left[left_columns].rename(columns=left_names).reset_index(drop=True)
+    left_part[on] = normalize_keys(left_part[on])
+    right_part = right[right_columns].rename(columns=right_names).reset_index(drop=True)
+    key_index = load_key_index(right[on])
+
+    if key_index['unique']:
+        positions = key_index['index'].get_indexer(left_part[on].to_numpy(dtype=object))
+        matched = positions >= 0
+        if matched.all():
+            right_rows = right_part.iloc[positions].reset_index(drop=True)
+        else:
+            # Las filas sin coincidencia quedan vacías (NaN), como en pd.merge
+            right_rows = right_part.reindex(np.where(matched, positions, -1)).reset_index(drop=True)
+        joined = pd.concat([left_part, right_rows], axis=1)
+        unmatched = int((~matched).sum())
+    else:
+        right_part[on] = key_index['index'].to_numpy()
+        joined = pd.merge(left_part, right_part, on=on, how='left', indicator=True)
+        unmatched = int((joined.pop('_merge') == 'left_only').sum())
+
+    report = {
+        'Unión': name or on,
+        'Filas izquierda': len(left),
+        'Filas derecha': len(right),
+        'Claves repetidas (derecha)': key_index['duplicates'],
+        'Filas resultado': len(joined),
+        'Sin coincidencia': unmatched
+    }
+    return joined, report
@@ -0,0 +1,212 @@
+import numpy as np
+import pandas as pd
+
+from durations import duration_months
+from profiling import profiled
+
+# Columnas de fecha de la planilla de operaciones
+date_columns = ['FechaCartaConsulta', 'FechaAprobacion', 'FechaVigencia', 'FechaElegibilidad', 'FechaPrimeDesembolso']
+
+# Mapeo de estaciones a sus respectivas columnas de fecha (inicio, fin)
+operations = {
+    'Elegibilidad - Vigencia': ('FechaVigencia', 'FechaElegibilidad'),
+    'PrimerDesembolso - Elegibilidad': ('FechaElegibilidad', 'FechaPrimeDesembolso'),
+    'Vigencia - Aprobacion': ('FechaAprobacion', 'FechaVigencia'),
+    'Aprobacion - Carta Consulta': ('FechaCartaConsulta', 'FechaAprobacion')
+}
+
+# Categorías de productividad con KPI calculado y la de filas sin KPI
+productivity_labels = ["Eficiente", "Aceptable", "Con Demora", "Alta Demora"]
+insufficient_label = "Datos insuficientes"
+
+# Límites por defecto en meses entre categorías consecutivas de productividad
+# (el perfil configurable está en productivity.py)
+productivity_limits = (6.0, 8.0, 12.0)
+
+# Columnas de la tabla larga de resultados, en el orden en que se muestran
+result_columns = [
+    'ESTACIONES', 'ANO', 'PAIS', 'CODIGO', 'APODO', 'Indicador_Principal',
+    'Indicador_Secundario', 'TIPO_DE_KPI', 'KPI', 'Productividad'
+]
+
+
+# Función para calcular la diferencia en meses entre dos fechas
+def calculate_kpi(end_date, start_date):
+    if pd.isnull(start_date) or pd.isnull(end_date):
+        return None  # Si alguna de las fechas está vacía, el KPI no se calcula
+    return round(((end_date - start_date).days / 30), 2)
+
+# Función para calcular la productividad basada en el KPI
+def calculate_productivity(kpi):
+    if kpi is None:
+        return "Datos insuficientes"
+    if kpi < 6:
+        return "Eficiente"
+    elif kpi < 8:
+        return "Aceptable"
+    elif kpi < 12:
+        return "Con Demora"
+    else:
+        return "Alta Demora"
+
+# Función para obtener el año de la fecha correspondiente a la operación
+def get_year_for_operation(date):
+    return date.year if pd.notnull(date) else None
+
+# Función para obtener solo la primera palabra del nombre de la estación
+def get_first_word(station):
+    return station.split()[0] if station else None
+
+
+# Versión vectorizada de calculate_kpi: meses redondeados a dos decimales, NaN si
+# falta una fecha. Por defecto días / 30; ver durations.duration_units para las
+# otras unidades (`countries`, uno por fila, se usa en el modo de días hábiles).
+def calculate_kpi_array(end_dates, start_dates, unit='dias30', countries=None):
+    return np.round(duration_months(start_dates, end_dates, unit=unit, countries=countries), 2)
+
+# Versión vectorizada de calculate_productivity sobre un arreglo de KPI. `limits`
+# son los límites entre categorías: los mismos para todas las filas (1-D) o una
+# fila de límites por KPI (2-D). Cada KPI cae en la categoría cuyo índice es el
+# número de límites menores o iguales a él, calculado en una sola pasada.
+def calculate_productivity_array(kpi, limits=productivity_limits):
+    kpi = np.asarray(kpi, dtype='float64')
+    limits = np.asarray(limits, dtype='float64')
+    if limits.ndim == 1:
+        positions = np.searchsorted(limits, kpi, side='right')
+    else:
+        positions = (kpi[:, None] >= limits).sum(axis=1)
+    positions[np.isnan(kpi)] = len(productivity_labels)
+    return np.array(productivity_labels + [insufficient_label], dtype=object)[positions]
+
+# Formatea fechas como '%d/%m/%Y' formateando cada fecha distinta una sola vez
+def format_dates(dates):
+    codes, uniques = pd.factorize(pd.Series(dates))
+    labels = np.asarray(pd.DatetimeIndex(uniques).strftime('%d/%m/%Y'), dtype=object)
+    formatted = np.full(len(codes), None, dtype=object)
+    present = codes >= 0
+    formatted[present] = labels[codes[present]]
+    return formatted
+
+
+# Fechas de inicio y fin de cada (operación, estación), aplanadas fila por fila
+# en el orden de `operations`
+def station_dates(data):
+    starts = np.column_stack([data[start].to_numpy(dtype='datetime64[ns]') for start, _ in operations.values()]).ravel()
+    ends = np.column_stack([data[end].to_numpy(dtype='datetime64[ns]') for _, end in operations.values()]).ravel()
+    return starts, ends
+
+
+# Columnas de texto repetidas de la tabla larga, guardadas como categorías
+categorical_columns = ['ESTACIONES', 'PAIS', 'CODIGO', 'APODO', 'TIPO_DE_KPI', 'Productividad']
+
+# Columnas de fecha de la tabla larga (datetime64; se formatean al mostrar o exportar)
+indicator_columns = ['Indicador_Principal', 'Indicador_Secundario']
+
+# Formato de las fechas de los indicadores al mostrarlas o exportarlas
+indicator_format = '%d/%m/%Y'
+
+
+# Construye la tabla larga (operación x estación) a partir de la planilla ancha de fechas.
+# Produce las mismas filas, en el mismo orden, que el recorrido con iterrows: por cada
+# operación, una fila por estación en el orden de `operations`.
+#
+# La tabla se guarda compacta: los textos repetidos como categorías, el año como
+# Int16, el KPI como float32 y los indicadores como datetime64. Para obtener la
+# forma original (textos y fechas formateadas) se usa expand_results. `unit` es
+# la unidad de duración del KPI (ver durations.duration_units).
+@profiled('tabla_kpi')
+def build_results_df(data, unit='dias30'):
+    return assemble_results(data, station_columns(data, unit=unit))
+
+# Columnas de ancho fijo de la tabla larga que se calculan fila por fila: las
+# fechas de los indicadores, el año (con su máscara de vacíos), el KPI y el
+# código de productividad. Es la parte de build_results_df que depende de cada
+# fila; partitions.py la reparte por país entre procesos.
+station_column_dtypes = {
+    'Indicador_Principal': 'datetime64[ns]',
+    'Indicador_Secundario': 'datetime64[ns]',
+    'ANO': 'int16',
+    'ANO_vacio': 'bool',
+    'KPI': 'float32',
+    'Productividad': 'int8'
+}
+
+# Calcula las columnas de station_column_dtypes de la planilla ancha de fechas
+def station_columns(data, unit='dias30'):
+    starts, ends = station_dates(data)
+    countries = repeat_categorical(data['PAIS'], len(operations))
+    kpi = calculate_kpi_array(ends, starts, unit=unit, countries=countries)
+    productivity = pd.Categorical(calculate_productivity_array(kpi), categories=[insufficient_label] + productivity_labels)
+    missing = np.isnat(ends)
+    return {
+        'Indicador_Principal': ends,
+        'Indicador_Secundario': starts,
+        'ANO': np.where(missing, 0, ends.astype('datetime64[Y]').astype('int64') + 1970).astype('int16'),
+        'ANO_vacio': missing,
+        'KPI': kpi.astype('float32'),
+        'Productividad': productivity.codes.astype('int8')
+    }
+
+# Arma la tabla larga con las columnas de station_columns (de toda la planilla,
+# en el orden de sus filas) y las columnas de texto de la planilla como categorías
+def assemble_results(data, columns):
+    n_rows = len(data)
+    names = list(operations)
+    station_names = pd.Categorical([get_first_word(name) for name in names])
+    kpi_names = pd.Categorical(names, categories=names)
+    n_stations = len(names)
+
+    return pd.DataFrame({
+        'ESTACIONES': pd.Categorical.from_codes(np.tile(station_names.codes, n_rows), dtype=station_names.dtype),
+        'ANO': pd.arrays.IntegerArray(columns['ANO'], columns['ANO_vacio']),
+        'PAIS': repeat_categorical(data['PAIS'], n_stations),
+        'CODIGO': repeat_categorical(data['NO. OPERACION'], n_stations),
+        'APODO': repeat_categorical(data['APODO'], n_stations),
+        'Indicador_Principal': columns['Indicador_Principal'],
+        'Indicador_Secundario': columns['Indicador_Secundario'],
+        'TIPO_DE_KPI': pd.Categorical.from_codes(np.tile(kpi_names.codes, n_rows), dtype=kpi_names.dtype),
+        'KPI': columns['KPI'],
+        'Productividad': pd.Categorical.from_codes(columns['Productividad'],
+                                                   categories=[insufficient_label] + productivity_labels)
+    }, columns=result_columns)
+
+# Repite cada valor de una columna de la planilla `times` veces, como categoría.
+# Se factoriza la columna original (una vez por operación) y se repiten los códigos.
+def repeat_categorical(values, times):
+    codes, categories = pd.factorize(pd.Series(values))
+    return pd.Categorical.from_codes(np.repeat(codes, times), categories=pd.Index(np.asarray(categories)))
+
+
+# Devuelve la tabla larga con la representación original: textos como object,
+# el año como int64 (float64 si falta alguno), el KPI como float64 redondeado a
+# dos decimales y los indicadores formateados como '%d/%m/%Y'. Se usa al
+# exportar (por tandas) y como referencia del informe de memoria.
+def expand_results(results_df):
+    expanded = {}
+    for name in results_df.columns:
+        column = results_df[name]
+        if name in indicator_columns:
+            values = format_dates(column.to_numpy(dtype='datetime64[ns]'))
+        elif name == 'ANO':
+            values = column.to_numpy(dtype='float64')
+            if not np.isnan(values).any():
+                values = values.astype('int64')
+        elif name == 'KPI':
+            values = np.round(column.to_numpy(dtype='float64'), 2)
+        elif isinstance(column.dtype, pd.CategoricalDtype):
+            values = column.to_numpy(dtype=object)
+        else:
+            values = column.to_numpy()
+        expanded[name] = values
+    return pd.DataFrame(expanded, index=results_df.index, columns=results_df.columns)
+
+# Bytes por fila de la tabla larga compacta y de su representación original
+def memory_report(results_df):
+    rows = max(len(results_df), 1)
+    compact = int(results_df.memory_usage(deep=True).sum())
+    expanded = int(expand_results(results_df).memory_usage(deep=True).sum())
+    return pd.DataFrame({
+        'Representación': ['Original (texto)', 'Compacta (categorías)'],
+        'Bytes por fila': [round(expanded / rows, 1), round(compact / rows, 1)],
+        'Total (MB)': [round(expanded / 2**20, 2), round(compact / 2**20, 2)]
+    })
@@ -0,0 +1,36 @@
+import numpy as np
+
+
+# Textos de las etiquetas: el valor truncado a entero, como f"{int(value)}", o
+# redondeado con `rounded`, como int(round(value)); vacío si no hay valor
+def integer_labels(values, rounded=False):
+    values = np.asarray(values, dtype='float64')
+    present = np.isfinite(values)
+    labels = np.full(values.shape, '', dtype=object)
+    labels[present] = (np.round if rounded else np.trunc)(values[present]).astype('int64').astype(str)
+    return labels
+
+
+# Función para agregar etiquetas de valor en los gráficos de barra con
+# ax.bar_label: el valor entero de cada barra en su extremo (a la derecha si es
+# horizontal, arriba si es vertical; bar_label lo sabe por la orientación de
+# cada grupo de barras). `padding` separa la etiqueta del extremo, en puntos.
+def add_value_labels(ax, padding=0, rounded=False, **kwargs):
+    for container in ax.containers:
+        ax.bar_label(container, labels=integer_labels(container.datavalues, rounded), padding=padding, **kwargs)
+
+# Etiquetas de un gráfico de barras apiladas dibujado con DataFrame.plot(stacked=True)
+# (filas = barras, columnas = segmentos en el orden en que se apilan): el valor
+# de cada segmento positivo en su centro y el total de los segmentos positivos
+# en el extremo del último segmento, que es el tope de la barra cuando los
+# valores no son negativos (los promedios de KPI).
+def add_stacked_labels(ax, table, fontsize=9):
+    values = np.nan_to_num(np.asarray(table, dtype='float64'))
+    if not values.shape[1]:
+        return
+    containers = ax.containers[-values.shape[1]:]
+    for container, column in zip(containers, values.T):
+        ax.bar_label(container, labels=integer_labels(np.where(column > 0, column, np.nan)), label_type='center',
+                     fontsize=fontsize, color='white')
+    totals = np.where(values > 0, values, 0).sum(axis=1)
+    ax.bar_label(containers[-1], labels=integer_labels(totals), fontsize=fontsize, color='black')
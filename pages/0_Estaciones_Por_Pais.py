@@ -1,77 +1,64 @@
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
+
+from charts import draw_year_months, render_chart
+from cube import cube_distinct, cube_group, slice_cube
+from kpi import productivity_labels
+from pipeline import (Pipeline, run_load_stages, select_duration_unit, session_profile, show_pipeline_report,
+                      show_profile_panel, start_profile_panel, upload_workbooks)
 
 def run():
     # Set page config
     st.set_page_config(page_title="Análisis de Proyectos", page_icon="📊")
 
-    # Upload the Excel file
-    uploaded_file = st.file_uploader("Carga tu archivo Excel", type=["xlsx"])
-
-    if uploaded_file is not None:
-        data = pd.read_excel(uploaded_file)
-
-        # Convert the columns to datetime format (if they aren't already)
-        date_columns = ['FechaCartaConsulta', 'FechaAprobacion', 'FechaVigencia', 'FechaElegibilidad', 'FechaPrimeDesembolso']
-        for col in date_columns:
-            data[col] = pd.to_datetime(data[col], errors='coerce')
+    # Opt-in per-rerun timing breakdown in the sidebar
+    start_profile_panel()
 
-        # Calculate the difference in months between the specified columns
-        for i in range(len(date_columns) - 1):
-            start_col = date_columns[i]
-            end_col = date_columns[i + 1]
-            diff_col_name = 'Meses_' + start_col[5:] + '_' + end_col[5:]
-            data[diff_col_name] = ((data[end_col] - data[start_col]).dt.days / 30).clip(lower=0)
+    # Workbooks of the session (uploaded on this page or on another one)
+    workbooks = upload_workbooks()
 
-        # Extract year from each date column and create new columns with year information
-        for col in date_columns:
-            data['AÑO' + col[5:]] = data[col].dt.year
+    if workbooks:
+        # Load the workbook and build the long KPI table and the aggregate cube
+        # (year, country, station, productivity). These are session stages shared
+        # with the other pages: if another page already built them they are reused
+        pipeline = Pipeline('estaciones')
+        _, cube = run_load_stages(pipeline, workbooks, profile=session_profile(), unit=select_duration_unit())
 
-        # Find the min and max year from all relevant year columns
-        year_columns = ['AÑO' + col[5:] for col in date_columns]
-        min_year = int(data[year_columns].min().min())
-        max_year = int(data[year_columns].max().max())
+        # Find the min and max year of the cube cells
+        years = cube['ANO'].dropna().astype(int)
+        min_year, max_year = int(years.min()), int(years.max())
 
         # Slider for year range selection
         year_range = st.slider('Selecciona el rango de años:', min_value=min_year, max_value=max_year, value=(min_year, max_year))
 
         # User input for country selection
-        country = st.selectbox("Selecciona un país:", data['PAIS'].unique())
+        country = st.selectbox("Selecciona un país:", list(cube['PAIS'].dropna().unique()))
 
         # User input for analysis type
         analysis_type = st.selectbox("Selecciona el tipo de análisis:", ["CartaConsulta-Aprobación", "Aprobación-Vigencia", "Vigencia-Elegibilidad", "Elegibilidad-PrimeDesembolso"])
 
-        # Determine the column for analysis based on the user's selection
+        # Determine the columns and the cube station for the analysis based on the user's selection
         column_mapping = {
-            "CartaConsulta-Aprobación": ('Meses_CartaConsulta_Aprobacion', 'AÑOAprobacion'),
-            "Aprobación-Vigencia": ('Meses_Aprobacion_Vigencia', 'AÑOVigencia'),
-            "Vigencia-Elegibilidad": ('Meses_Vigencia_Elegibilidad', 'AÑOElegibilidad'),
-            "Elegibilidad-PrimeDesembolso": ('Meses_Elegibilidad_PrimeDesembolso', 'AÑOPrimeDesembolso')
+            "CartaConsulta-Aprobación": ('Meses_CartaConsulta_Aprobacion', 'AÑOAprobacion', 'Aprobacion'),
+            "Aprobación-Vigencia": ('Meses_Aprobacion_Vigencia', 'AÑOVigencia', 'Vigencia'),
+            "Vigencia-Elegibilidad": ('Meses_Vigencia_Elegibilidad', 'AÑOElegibilidad', 'Elegibilidad'),
+            "Elegibilidad-PrimeDesembolso": ('Meses_Elegibilidad_PrimeDesembolso', 'AÑOPrimeDesembolso', 'PrimerDesembolso')
         }
-        month_column, year_column = column_mapping[analysis_type]
-
-        # Filter data by country and ensure that the months are non-negative and greater than zero
-        filtered_data = data[(data['PAIS'] == country) & (data[month_column] >= 0)]
-
-        # Filter data based on the selected year range
-        filtered_data = filtered_data[(filtered_data[year_column] >= year_range[0]) & (filtered_data[year_column] <= year_range[1])]
+        month_column, year_column, station = column_mapping[analysis_type]
 
-        # Group by the appropriate year column and calculate the mean of the selected column
-        grouped = filtered_data.groupby(year_column)[month_column].mean().reset_index()
+        # Select the cube cells for the country, station and year range where the months are known
+        filtered_cells = slice_cube(cube, years=year_range, countries=[country], stations=[station], productivity=productivity_labels)
 
-        # Round the months to two decimal places
-        grouped[month_column] = grouped[month_column].round(2)
-
-        # Count the number of unique operations per year where the difference is calculated
-        operations_count = filtered_data.groupby(year_column)['NO. OPERACION'].nunique().reset_index()
-        operations_count.rename(columns={'NO. OPERACION': 'Operaciones por Año'}, inplace=True)
+        # Group by year: mean of the months and number of unique operations where the difference is calculated
+        by_year = cube_group(filtered_cells, 'ANO', measure='meses', decimals=2)
+        final_data = pd.DataFrame({
+            year_column: by_year.index,
+            month_column: by_year['promedio'].to_numpy(),
+            'Operaciones por Año': by_year['operaciones'].to_numpy()
+        })
 
         # Count the total number of unique operations where the difference is calculated
-        operation_total = filtered_data['NO. OPERACION'].nunique()
-
-        # Merge the unique operations count with the mean duration data
-        final_data = pd.merge(grouped, operations_count, on=year_column)
+        operation_total = cube_distinct(filtered_cells)
 
         # Display the metrics at the top
         total_average = final_data[month_column].mean()
@@ -79,22 +66,17 @@ def run():
         col1.metric("Promedio Total de Meses", f"{total_average:.2f}")
         col2.metric("Proyectos Totales", operation_total)
 
-        # Plotting
-        fig, ax = plt.subplots(figsize=(10, 6))
-        final_data.plot(kind='bar', x=year_column, y=month_column, ax=ax, color='lightblue', legend=False)
-        ax.set_ylabel('Meses')
-        ax.set_xlabel('Año')
-        ax.set_title(f'{analysis_type} - {country}')
-        for bar in ax.patches:
-            yval = bar.get_height()
-            ax.text(bar.get_x() + bar.get_width()/2, yval + 0.1, int(round(yval)), ha='center', va='bottom')
-
-        st.pyplot(fig)
+        # Plotting (rendered once per data and selection, then served from the cache)
+        chart = render_chart(draw_year_months, final_data, year_column, month_column, f'{analysis_type} - {country}')
+        st.image(chart, width='stretch')
 
         # Show the final data table
         st.write("Detalles por año:")
         st.dataframe(final_data)
 
+        show_pipeline_report(pipeline)
+        show_profile_panel('Estaciones por país')
+
 if __name__ == "__main__":
     run()
 
@@ -1,273 +1,143 @@
+import os
+
 import streamlit as st
-import pandas as pd
-import io
 import seaborn as sns
-import matplotlib as plt
-import matplotlib.pyplot as plt
-
-# Función para calcular la diferencia en meses entre dos fechas
-def calculate_kpi(end_date, start_date):
-    if pd.isnull(start_date) or pd.isnull(end_date):
-        return None  # Si alguna de las fechas está vacía, el KPI no se calcula
-    return round(((end_date - start_date).days / 30), 2)
-
-# Función para calcular la productividad basada en el KPI
-def calculate_productivity(kpi):
-    if kpi is None:
-        return "Datos insuficientes"
-    if kpi < 6:
-        return "Eficiente"
-    elif kpi < 8:
-        return "Aceptable"
-    elif kpi < 12:
-        return "Con Demora"
-    else:
-        return "Alta Demora"
-
-# Función para obtener el año de la fecha correspondiente a la operación
-def get_year_for_operation(date):
-    return date.year if pd.notnull(date) else None
-
-# Función para obtener solo la primera palabra del nombre de la estación
-def get_first_word(station):
-    return station.split()[0] if station else None
+
+from altair_charts import chart_data, efficiency_chart
+from charts import (draw_country_average, draw_duration_histogram, draw_productivity_counts, draw_stacked_by_year,
+                    render_chart)
+from exports import lazy_excel, xlsx_mime
+from kpi import get_first_word, memory_report, operations
+from pipeline import (Pipeline, edit_profile, run_load_stages, select_duration_unit, show_memory_report,
+                      show_pipeline_report, show_profile_panel, show_results, start_profile_panel,
+                      upload_workbooks)
+from reports import aggregate_distribution, aggregate_efficiency, distribution_dimensions, filter_cells
+
+# Función para dibujar los gráficos de la página a partir de los agregados (imágenes PNG en caché)
+def render_efficiency(aggregates):
+    # Configurar el estilo de Seaborn para los gráficos
+    sns.set_theme(style="whitegrid")
+    figsize = (7, 5)  # Definir el tamaño de la figura para los gráficos
+    return {
+        'country': render_chart(draw_country_average, aggregates['kpi_avg_by_country'], figsize),
+        'productivity': render_chart(draw_productivity_counts, aggregates['productivity_count'], figsize),
+        'stacked': render_chart(draw_stacked_by_year, aggregates['kpi_by_year_country'], (12, 6))
+    }
 
 # Función principal de la app de Streamlit
 def run():
     st.set_page_config(page_title="Análisis de Eficiencia Operativa", page_icon="📊")
 
-    uploaded_file = st.file_uploader("Carga tu archivo Excel", type=["xlsx"])
-
-    if uploaded_file is not None:
-        data = pd.read_excel(uploaded_file)
-
-        # Convertir las columnas de fecha a datetime y extraer el año
-        date_columns = ['FechaCartaConsulta', 'FechaAprobacion', 'FechaVigencia', 'FechaElegibilidad', 'FechaPrimeDesembolso']
-        for col in date_columns:
-            data[col] = pd.to_datetime(data[col], errors='coerce')
-
-        # Mapeo de estaciones a sus respectivas columnas de fecha
-        operations = {
-            'Elegibilidad - Vigencia': ('FechaVigencia', 'FechaElegibilidad'),
-            'PrimerDesembolso - Elegibilidad': ('FechaElegibilidad', 'FechaPrimeDesembolso'),
-            'Vigencia - Aprobacion': ('FechaAprobacion', 'FechaVigencia'),
-            'Aprobacion - Carta Consulta': ('CartaConsulta', 'FechaAprobacion')
-        }
-
-        # Lista para almacenar los resultados
-        results = []
-
-        # Procesar las filas del DataFrame
-        for index, row in data.iterrows():
-            for operation, (start_col, end_col) in operations.items():
-                kpi = calculate_kpi(row[end_col], row[start_col])
-                productividad = calculate_productivity(kpi)
-                year = get_year_for_operation(row[end_col])
-                results.append({
-                    'ESTACIONES': get_first_word(operation),
-                    'ANO': year,
-                    'PAIS': row['PAIS'],
-                    'CODIGO': row['NO. OPERACION'],
-                    'APODO': row['APODO'],
-                    'Indicador_Principal': row[end_col].strftime('%d/%m/%Y') if pd.notnull(row[end_col]) else None,
-                    'Indicador_Secundario': row[start_col].strftime('%d/%m/%Y') if pd.notnull(row[start_col]) else None,
-                    'TIPO_DE_KPI': operation,
-                    'KPI': kpi,
-                    'Productividad': productividad
-                })
-
-        # Convertir la lista de resultados en un DataFrame
-        results_df = pd.DataFrame(results)
-
-        # Mostrar el DataFrame en la aplicación
-        st.write("Datos Procesados:")
-        st.dataframe(results_df)
-
-        # Convertir el DataFrame a un archivo de Excel para la descarga
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            results_df.to_excel(writer, index=False)
-        st.download_button(
-            label="Descargar como Excel",
-            data=output.getvalue(),
-            file_name='resultados_kpi_productividad.xlsx',
-            mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
+    # Perfil de tiempos por rerun (opcional) en la barra lateral
+    start_profile_panel()
+
+    # Planillas de la sesión (las cargadas en esta página o en otra)
+    workbooks = upload_workbooks()
+
+    if workbooks:
+        # Cada etapa se recalcula solo si cambian sus entradas; los filtros solo
+        # invalidan las etapas de filtro, agregados y gráficos. La tabla larga y el
+        # cubo son compartidos: si otra página ya los calculó, se reutilizan
+        pipeline = Pipeline('eficiencia')
+
+        # Para planillas muy grandes: leer por tandas y construir solo el cubo de agregados
+        streaming = st.sidebar.toggle("Lectura por tandas (planillas grandes)", value=False)
+
+        # Con varios núcleos: calcular la tabla larga y el cubo por país en procesos paralelos
+        partitioned = st.sidebar.toggle("Cálculo en paralelo por país", value=False,
+                                        help=f"Reparte los países entre {os.cpu_count() or 1} núcleos.")
+
+        # Umbrales de productividad: al cambiarlos solo se reclasifican la tabla y el cubo
+        profile = edit_profile()
+
+        # Unidad de duración de los KPI (días / 30, meses calendario o días hábiles)
+        unit = select_duration_unit()
+
+        # Cargar la planilla, construir la tabla larga (operación x estación) y el cubo de agregados
+        results_df, cube = run_load_stages(pipeline, workbooks, streaming=streaming, profile=profile, unit=unit,
+                                           partitioned=partitioned)
 
-        # Configurar el estilo de Seaborn para los gráficos
-        sns.set_theme(style="whitegrid")
+        if results_df is None:
+            st.info("Lectura por tandas o varias planillas: se muestran los indicadores agregados; la tabla detallada y su descarga no están disponibles.")
+        else:
+            # Mostrar el DataFrame en la aplicación con su botón de descarga
+            show_results(results_df)
+            show_memory_report(pipeline.stage('memoria', memory_report, results_df, depends=('clasificacion',)))
 
         # Título del Dashboard
         st.title("Dashboard de Eficiencia Operativa")
 
-        # Definir la paleta de colores para los países
-        country_colors = {
-            "ARGENTINA": "#36A9E1",
-            "BOLIVIA": "#F39200",
-            "BRASIL": "#009640",
-            "PARAGUAY": "#E30613",
-            "URUGUAY": "#27348B"
-        }
+        # Gráficos interactivos: se envía al navegador solo la tabla agregada y los
+        # filtros de año y estación se aplican ahí, sin volver a ejecutar la página
+        interactive = st.sidebar.toggle("Gráficos interactivos (en el navegador)", value=False)
+
         # Filtros en la parte superior
         # Filtro de línea temporal para el año
-        years = results_df['ANO'].dropna().astype(int)
+        years = cube['ANO'].dropna().astype(int)
         min_year, max_year = int(years.min()), int(years.max())
-        selected_years = st.slider('Selecciona el rango de años:', min_year, max_year, (min_year, max_year))
-
-        # Filtro por estación con opción "Todas"
-        all_stations = ['Todas'] + list(results_df['ESTACIONES'].dropna().unique())
-        selected_station = st.selectbox('Selecciona una Estación', all_stations)
-
-        # Aplicar filtros al DataFrame
-        filtered_df = results_df[
-            (results_df['ANO'] >= selected_years[0]) &
-            (results_df['ANO'] <= selected_years[1])
-        ]
-        if selected_station != 'Todas':
-            filtered_df = filtered_df[filtered_df['ESTACIONES'].str.contains(selected_station)]
-
-        # Filtrar los datos insuficientes para el gráfico de conteo de productividad
-        filtered_df = filtered_df[filtered_df['Productividad'] != "Datos insuficientes"]
+        stations = [get_first_word(operation) for operation in operations]
+        if interactive:
+            # Las métricas y la tabla resumida cubren todos los años y estaciones
+            selected_years, selected_station = (min_year, max_year), 'Todas'
+        else:
+            selected_years = st.slider('Selecciona el rango de años:', min_year, max_year, (min_year, max_year))
+
+            # Filtro por estación con opción "Todas"
+            all_stations = ['Todas'] + stations
+            selected_station = st.selectbox('Selecciona una Estación', all_stations)
+
+        # Aplicar filtros, calcular agregados y dibujar los gráficos
+        filtered_cells, filtered_cube = pipeline.stage('filtro', filter_cells, cube, selected_years, selected_station,
+                                                       depends=('cubo',), params=(selected_years, selected_station))
+        aggregates = pipeline.stage('agregados', aggregate_efficiency, filtered_cells, filtered_cube, depends=('filtro',))
+        if not interactive:
+            figures = pipeline.stage('graficos', render_efficiency, aggregates, depends=('agregados',))
 
         # Incluir gráficos
         st.header("         Análisis de la Eficiencia Operativa")
-        figsize = (7, 5)  # Definir el tamaño de la figura para los gráficos
-
-        # Cálculo de KPI Promedio y conteo de operaciones únicas
-        average_kpi = filtered_df['KPI'].mean()
-        unique_operation_count = filtered_df['CODIGO'].nunique()  # Usamos nunique() para contar códigos únicos
-        total_stations = len(filtered_df)  # Conteo total de estaciones (filas)
-
-        # Mostrar métricas de KPI Promedio, conteo de operaciones únicas y total de estaciones
-        col1, col2, col3 = st.columns(3)
-        col1.metric("Tiempo Promedio en Meses", f"{average_kpi:.2f}")
-        col2.metric("Proyectos", unique_operation_count)
-        col3.metric("Total de Estaciones", total_stations)
-
-       
-        # Función auxiliar para agregar etiquetas de valor en los gráficos de barra
-        def add_value_labels(ax, is_horizontal=False):
-            for rect in ax.patches:
-                # Obtener las coordenadas X e Y del comienzo de la barra
-                x_value = rect.get_x() + rect.get_width() / 2
-                y_value = rect.get_y() + rect.get_height() / 2
-                # Decidir si la etiqueta es para un gráfico horizontal o vertical
-                if is_horizontal:
-                    value = rect.get_width()
-                    label = f"{int(value)}"  # Convertir a entero y formatear
-                    ax.text(value, y_value, label, ha='left', va='center')
-                else:
-                    value = rect.get_height()
-                    label = f"{int(value)}"  # Convertir a entero y formatear
-                    ax.text(x_value, value, label, ha='center', va='bottom')
-
-        # Utilizar st.columns para colocar gráficos lado a lado
-        col1, col2 = st.columns(2)
-
-        with col1:
-            st.subheader("Tiempo de Respuesta Promedio en Meses por País")
-            fig, ax = plt.subplots(figsize=figsize)
-            
-            # Calcular el KPI promedio por país
-            kpi_avg_by_country = filtered_df.groupby('PAIS')['KPI'].mean().sort_values(ascending=True)
-            
-            # Crear una lista de colores que coincida con el orden de los países en 'kpi_avg_by_country'
-            country_order = kpi_avg_by_country.index
-            country_palette = [country_colors.get(country, "#333333") for country in country_order]
-
-            # Dibujar el gráfico de barras con la paleta de colores específica
-            sns.barplot(x=kpi_avg_by_country.values, y=country_order, ax=ax, palette=country_palette)
-            
-            # Agregar las etiquetas de valor
-            add_value_labels(ax, is_horizontal=True)
-            
-            plt.tight_layout()
-            st.pyplot(fig)
-
-        with col2:
-            st.subheader("Eficiencia en Tiempos de Respuesta")
-            fig, ax = plt.subplots(figsize=figsize)
-            productivity_count = filtered_df['Productividad'].value_counts().sort_values()
-            sns.barplot(x=productivity_count.values, y=productivity_count.index, ax=ax, palette='Spectral')
-            add_value_labels(ax, is_horizontal=True)
-            plt.tight_layout()
-            st.pyplot(fig)
-
-        # Reemplazamos el gráfico de "Tiempo de Respuesta a lo largo del tiempo" por el gráfico de barras apiladas
-        st.subheader("Tiempo Promedio por Año y País")
-
-        # Definir la paleta de colores para los países
-        country_colors = {
-            "ARGENTINA": "#36A9E1",
-            "BOLIVIA": "#F39200",
-            "BRASIL": "#009640",
-            "PARAGUAY": "#E30613",
-            "URUGUAY": "#27348B"
-        }
-
-        # Aplicar filtros al DataFrame
-        filtered_df = results_df[
-            (results_df['ANO'] >= selected_years[0]) &
-            (results_df['ANO'] <= selected_years[1])
-        ]
-        if selected_station != 'Todas':
-            filtered_df = filtered_df[filtered_df['ESTACIONES'].str.contains(selected_station)]
-
-        # Preparación de datos para el gráfico de barras apiladas
-        kpi_by_year_country = filtered_df.pivot_table(values='KPI', index='ANO', columns='PAIS', aggfunc='mean').fillna(0)
-        # Aseguramos que los años sean enteros y se muestren como tal en el eje X
-        kpi_by_year_country.index = kpi_by_year_country.index.map(int)
-
-        # Creamos una lista de colores basada en los países presentes en el DataFrame y en el orden correcto
-        colors = [country_colors.get(country, "#333333") for country in kpi_by_year_country.columns]
-
-        # Gráfico de barras apiladas con colores específicos
-        fig, ax = plt.subplots(figsize=(12, 6))
-        kpi_by_year_country.plot(kind='bar', stacked=True, color=colors, ax=ax)
-
-        # Agregar etiquetas de valor a cada segmento de barra
-        for i, (year, values) in enumerate(kpi_by_year_country.iterrows()):
-            height_accumulator = 0  # Acumulador para la altura de las barras
-            for country in values.index:
-                value = values[country]
-                if value > 0:  # Solo agregamos etiquetas a valores positivos
-                    label_y = height_accumulator + (value / 2)
-                    ax.text(i, label_y, f'{int(value)}', ha='center', va='center', fontsize=9, color='white')
-                    height_accumulator += value
-            # Colocar la etiqueta del total acumulado en la parte superior de la barra
-            ax.text(i, height_accumulator, f'{int(height_accumulator)}', ha='center', va='bottom', fontsize=9, color='black')
-
-        ax.set_ylabel('KPI Promedio')
-        ax.set_xlabel('Año')
-        ax.set_xticklabels([str(x) for x in kpi_by_year_country.index], rotation=0)
-        ax.legend(title='País', bbox_to_anchor=(1.05, 1), loc='upper left')
-        plt.tight_layout()
-        st.pyplot(fig)
-
-        filtered_df['ANO'] = filtered_df['ANO'].astype(int)     
-
-        # Pivotear el DataFrame para obtener el KPI promedio por país y año
-        kpi_pivot_df = filtered_df.pivot_table(values='KPI', index='PAIS', columns='ANO', aggfunc='mean')
-
-        # Redondear todos los valores numéricos a dos decimales
-        kpi_pivot_df = kpi_pivot_df.round(2)
-
-        # Opción para reemplazar los valores None/NaN con un string vacío
-        kpi_pivot_df = kpi_pivot_df.fillna('')
-
-        # Convertir las etiquetas de las columnas a enteros (los años)
-        kpi_pivot_df.columns = kpi_pivot_df.columns.astype(int)
-
-        # Resetear el índice para llevar 'PAIS' a una columna
-        kpi_pivot_df.reset_index(inplace=True)
-
-
-        # Convertir el DataFrame pivotado a un archivo de Excel para la descarga
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            kpi_pivot_df.to_excel(writer, index=False)
-            # No es necesario llamar a writer.save() aquí, se guarda automáticamente al finalizar el bloque with
-        output.seek(0)  # Regresamos al principio del stream para que streamlit pueda leer el contenido
+
+        # Distribución de los tiempos (percentiles e histograma) de la selección, desglosada por la dimensión elegida
+        group_by = st.sidebar.selectbox("Desglosar percentiles por", list(distribution_dimensions),
+                                        format_func=distribution_dimensions.get)
+        distribution = pipeline.stage('distribucion', aggregate_distribution, filtered_cube, group_by,
+                                      depends=('filtro',), params=(group_by,))
+
+        # Mostrar métricas de KPI Promedio, mediana, conteo de operaciones únicas y total de estaciones
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Tiempo Promedio en Meses", f"{aggregates['average_kpi']:.2f}")
+        col2.metric("Mediana en Meses", f"{distribution['overall']['Mediana']:.2f}")
+        col3.metric("Proyectos", aggregates['unique_operation_count'])
+        col4.metric("Total de Estaciones", aggregates['total_stations'])
+
+        if interactive:
+            # Los tres gráficos en una sola especificación de Vega-Lite; los controles de
+            # año y estación y el resaltado por país (clic en la leyenda) van en el gráfico
+            data = pipeline.stage('datos_grafico', chart_data, cube, depends=('cubo',))
+            st.altair_chart(efficiency_chart(data, stations))
+        else:
+            # Utilizar st.columns para colocar gráficos lado a lado
+            col1, col2 = st.columns(2)
+
+            with col1:
+                st.subheader("Tiempo de Respuesta Promedio en Meses por País")
+                st.image(figures['country'], width='stretch')
+
+            with col2:
+                st.subheader("Eficiencia en Tiempos de Respuesta")
+                st.image(figures['productivity'], width='stretch')
+
+            # Gráfico de barras apiladas con el tiempo promedio por año y país
+            st.subheader("Tiempo Promedio por Año y País")
+            st.image(figures['stacked'], width='stretch')
+
+        # Los promedios de tiempos con demoras muy largas engañan: mediana y percentiles altos
+        st.subheader("Distribución de los Tiempos de Respuesta")
+        overall = distribution['overall']
+        st.image(render_chart(draw_duration_histogram, distribution['histogram'], overall['Mediana'], overall['P90'], (10, 4)),
+                 width='stretch')
+        st.dataframe(distribution['table'], hide_index=True)
+
+        kpi_pivot_df = aggregates['kpi_pivot_df']
 
         # Muestra el DataFrame en la aplicación
         st.write("Datos Resumidos:")
@@ -276,18 +146,14 @@ def run():
         # Botón de descarga en Streamlit
         st.download_button(
             label="Descargar KPI promedio por país y año como Excel",
-            data=output,
+            data=lazy_excel(kpi_pivot_df),  # Se genera recién al pedir la descarga
             file_name='kpi_promedio_por_pais_y_año.xlsx',
-            mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            mime=xlsx_mime
         )
 
+        show_pipeline_report(pipeline)
+        show_profile_panel('Eficiencia por estaciones')
 
 
 if __name__ == "__main__":
     run()
-
-
-
-
-
-
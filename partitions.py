@@ -0,0 +1,128 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pandas as pd
+
+from cube import build_cube, concat_cubes, encode_operations
+from kpi import assemble_results, date_columns, operations, station_column_dtypes, station_columns
+from productivity import default_profile
+from profiling import profiled
+
+# Cálculo particionado por país: la planilla se reparte en una partición por
+# PAIS y cada proceso calcula, para sus filas, las columnas fila por fila de la
+# tabla larga (kpi.station_columns) y el cubo de agregados parcial. Las fechas
+# de entrada y las columnas de salida viajan en bloques de memoria compartida:
+# cada proceso lee las filas de su país y escribe sus resultados en las
+# posiciones de esas filas, así que la tabla no se copia entre procesos ni hay
+# que reordenarla. De vuelta solo llega el cubo de cada país, que es chico.
+
+
+# Particiones de la planilla: posiciones de las filas de cada país, en orden
+# alfabético de país y con las filas sin país al final. Devuelve (país, filas);
+# el país de las filas sin país es None.
+def country_partitions(countries):
+    codes, names = pd.factorize(pd.Series(countries, dtype=object), sort=True)
+    codes = np.where(codes < 0, len(names), codes)
+    order = np.argsort(codes, kind='stable')
+    bounds = np.cumsum(np.bincount(codes, minlength=len(names) + 1))[:-1]
+    partitions = zip(list(names) + [None], np.split(order, bounds))
+    return [(name, rows) for name, rows in partitions if len(rows)]
+
+# Posiciones (en bytes) de cada arreglo dentro de un bloque compartido, alineadas a 8.
+# `layout` es {nombre: (dtype, largo)}; devuelve ({nombre: desplazamiento}, tamaño total).
+def _block_offsets(layout):
+    offsets, size = {}, 0
+    for name, (dtype, length) in layout.items():
+        offsets[name] = size
+        size += -(-np.dtype(dtype).itemsize * length // 8) * 8
+    return offsets, max(size, 1)
+
+# Vistas de los arreglos de `layout` sobre el bloque compartido (sin copiar)
+def _block_arrays(block, layout):
+    offsets, _ = _block_offsets(layout)
+    return {name: np.ndarray(length, dtype=dtype, buffer=block.buf, offset=offsets[name])
+            for name, (dtype, length) in layout.items()}
+
+# Tarea de un proceso: lee las fechas de las filas `rows` del bloque de entrada,
+# escribe las columnas de station_columns en el bloque de salida, en las
+# posiciones de esas filas en la tabla larga, y devuelve el cubo del país.
+# `operation_index` trae los códigos de las operaciones del país en la planilla
+# completa, así que el cubo usa los mismos códigos que el construido de una vez.
+def _partition_task(country, rows, operation_labels, operation_index, inputs, outputs, profile, unit):
+    # Los procesos del pool comparten el registro de recursos del principal, que
+    # es quien libera los bloques al terminar
+    input_block, output_block = SharedMemory(name=inputs[0]), SharedMemory(name=outputs[0])
+    try:
+        dates = _block_arrays(input_block, inputs[1])
+        data = pd.DataFrame({column: dates[column][rows] for column in date_columns})
+        del dates
+        data['PAIS'] = country
+        data['NO. OPERACION'] = operation_labels
+
+        n_stations = len(operations)
+        positions = (rows[:, None] * n_stations + np.arange(n_stations)).ravel()
+        columns = _block_arrays(output_block, outputs[1])
+        for name, values in station_columns(data, unit=unit).items():
+            columns[name][positions] = values
+        del columns
+
+        return build_cube(data, operation_index=operation_index, profile=profile, unit=unit)
+    finally:
+        input_block.close()
+        output_block.close()
+
+
+# Tabla larga de KPI (sin reclasificar, como kpi.build_results_df) y cubo de
+# agregados (como cube.build_cube) de la planilla ancha de fechas, calculados
+# por país en `workers` procesos (por omisión, uno por núcleo y como mucho uno
+# por país). El resultado es el mismo que el del cálculo de una vez, sin
+# importar el número de procesos: cada país escribe filas propias de la tabla,
+# los cubos se combinan en orden alfabético de país y los códigos de operación
+# se asignan sobre la planilla completa. Con un solo proceso las particiones se
+# calculan en este proceso, una tras otra.
+@profiled('por_pais')
+def build_partitioned(data, profile=default_profile, unit='dias30', workers=None):
+    partitions = country_partitions(data['PAIS'])
+    workers = min(workers or os.cpu_count() or 1, max(len(partitions), 1))
+    n_long = len(data) * len(operations)
+    input_layout = {column: ('datetime64[ns]', len(data)) for column in date_columns}
+    output_layout = {name: (dtype, n_long) for name, dtype in station_column_dtypes.items()}
+
+    input_block = SharedMemory(create=True, size=_block_offsets(input_layout)[1])
+    output_block = SharedMemory(create=True, size=_block_offsets(output_layout)[1])
+    try:
+        dates = _block_arrays(input_block, input_layout)
+        for column in date_columns:
+            dates[column][:] = data[column].to_numpy(dtype='datetime64[ns]')
+        del dates
+
+        operation_labels = data['NO. OPERACION'].to_numpy(dtype=object)
+        operation_codes = encode_operations(operation_labels, {})
+        tasks = []
+        for country, rows in partitions:
+            present = rows[operation_codes[rows] >= 0]
+            tasks.append((country, rows, operation_labels[rows], dict(zip(operation_labels[present], operation_codes[present])),
+                          (input_block.name, input_layout), (output_block.name, output_layout), profile, unit))
+        if workers <= 1:
+            parts = [_partition_task(*task) for task in tasks]
+        else:
+            # Los países más grandes primero, para repartir mejor la carga; los
+            # resultados se vuelven a ordenar por país antes de combinarlos
+            order = sorted(range(len(tasks)), key=lambda index: -len(tasks[index][1]))
+            # 'spawn': los procesos no heredan los hilos del servidor de Streamlit
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+                futures = {index: pool.submit(_partition_task, *tasks[index]) for index in order}
+                parts = [futures[index].result() for index in range(len(tasks))]
+
+        columns = {name: values.copy() for name, values in _block_arrays(output_block, output_layout).items()}
+    finally:
+        input_block.close()
+        input_block.unlink()
+        output_block.close()
+        output_block.unlink()
+
+    # Los países no comparten celdas: basta con concatenar sus cubos
+    return assemble_results(data, columns), concat_cubes(parts)
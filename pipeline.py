@@ -0,0 +1,234 @@
+import hashlib
+import operator
+import time
+
+import pandas as pd
+import streamlit as st
+
+from cube import aggregate_cube, build_cube_streaming, build_cube_workbooks, cube_base
+from durations import duration_units
+from exports import lazy_excel, xlsx_mime
+from ingest import file_digest, iter_workbook_chunks, normalize_dates, read_raw
+from kpi import build_results_df, expand_results, get_first_word, operations
+from partitions import build_partitioned
+from productivity import (classify_results, default_profile, load_profile, profile_from_table,
+                          profile_path, profile_table)
+from profiling import (append_profile_log, log_path, profile_enabled_by_env, profile_log_enabled_by_env,
+                       profile_records, start_profile)
+
+# Formato de las columnas de la tabla larga en st.dataframe: las fechas y el KPI
+# se formatean en el navegador, sin convertir la tabla a texto
+results_column_config = {
+    'ANO': st.column_config.NumberColumn(format='%d'),
+    'Indicador_Principal': st.column_config.DateColumn(format='DD/MM/YYYY'),
+    'Indicador_Secundario': st.column_config.DateColumn(format='DD/MM/YYYY'),
+    'KPI': st.column_config.NumberColumn(format='%.2f')
+}
+
+
+# Planillas distintas cuyas etapas compartidas se mantienen en memoria
+max_workbooks = 4
+
+# Resultados de etapas compartidas que se mantienen en memoria en el proceso (de
+# todas las sesiones): unas ocho etapas por planilla (lectura, fechas, tabla,
+# clasificación, cubo, ... y sus variantes por unidad o perfil). Al superarlo
+# se descarta el usado hace más tiempo.
+shared_stage_entries = 8 * max_workbooks
+
+
+# Huella estable de las entradas de una etapa (claves de etapas anteriores y parámetros)
+def _fingerprint(value):
+    return hashlib.sha256(repr(value).encode('utf-8')).hexdigest()
+
+# Resultado de una etapa compartida, en un caché del proceso acotado a
+# shared_stage_entries e indexado solo por la huella de la etapa (que incluye la
+# huella de la planilla): `_func` y `_args` no se hashean. Es un caché de
+# recursos y no de datos: todas las sesiones reciben el mismo objeto sin
+# copiarlo, así que los resultados no se modifican después de calculados (las
+# etapas devuelven tablas nuevas). `_computed` registra si hubo que calcularla.
+@st.cache_resource(max_entries=shared_stage_entries, show_spinner=False)
+def _shared_stage(key, _func, _args, _computed):
+    _computed.append(key)
+    return _func(*_args)
+
+
+# Pipeline de una página con etapas memorizadas.
+#
+# Cada etapa guarda el último resultado junto con la huella de sus entradas:
+# las claves de las etapas de las que depende (`depends`) y sus parámetros
+# (`params`, p. ej. la huella del archivo o los valores de los filtros). Si la
+# huella no cambió entre reruns se reutiliza el resultado; si cambió, se
+# recalcula y la nueva clave invalida a su vez a las etapas que dependen de ella.
+#
+# Las etapas de la página (filtros, agregados, gráficos) son chicas y se guardan
+# en la sesión del usuario. Las etapas con `shared` (la planilla, la tabla larga
+# y el cubo) se guardan en un caché común a todo el proceso (_shared_stage): las
+# reutilizan las demás páginas y las demás sesiones con la misma planilla,
+# unidad y perfil, y la memoria no crece con el número de sesiones.
+class Pipeline:
+    def __init__(self, name):
+        self.state = st.session_state.setdefault(f'pipeline:{name}', {})
+        self.keys = {}
+        self.report = []
+
+    def stage(self, name, func, *args, depends=(), params=(), shared=False):
+        key = _fingerprint((name, tuple(self.keys[dependency] for dependency in depends), params))
+        start = time.perf_counter()
+        if shared:
+            computed = []
+            value = _shared_stage(key, func, args, computed)
+            status = 'recalculada' if computed else 'reutilizada'
+        else:
+            cached = self.state.get(name)
+            if cached is not None and cached[0] == key:
+                value = cached[1]
+                status = 'reutilizada'
+            else:
+                value = func(*args)
+                self.state[name] = (key, value)
+                status = 'recalculada'
+        self.keys[name] = key
+        self.report.append({'Etapa': name, 'Alcance': 'compartida' if shared else 'página', 'Estado': status,
+                            'Tiempo (ms)': round((time.perf_counter() - start) * 1000, 1)})
+        return value
+
+
+# Etapas comunes de las páginas de estaciones: lectura, fechas, tabla larga de KPI y cubo.
+# Son etapas compartidas (entre páginas y sesiones, ver Pipeline). La clasificación por
+# productividad es una etapa aparte que depende del perfil de umbrales: al
+# cambiarlo solo se reclasifican la tabla y la base del cubo ya calculadas.
+# `unit` es la unidad de duración; al cambiarla se recalculan la tabla y la
+# base, pero no se vuelve a leer la planilla. Con `streaming` la planilla se lee
+# por tandas y solo se construye el cubo, sin mantener la planilla completa en
+# memoria; en ese caso la tabla larga es None y un cambio de perfil o de unidad
+# vuelve a leer la planilla. Con varias planillas se construye solo el cubo
+# combinado (ver cube.build_cube_workbooks), también sin tabla larga. Con
+# `partitioned` la tabla larga y el cubo se calculan por país en varios
+# procesos (ver partitions.build_partitioned); como el cubo ya sale clasificado,
+# un cambio de perfil vuelve a calcular las particiones.
+def run_load_stages(pipeline, workbooks, streaming=False, profile=default_profile, unit='dias30', partitioned=False):
+    contents = [workbook.getvalue() for workbook in workbooks]
+    digests = tuple(file_digest(content) for content in contents)
+    if len(contents) > 1:
+        cube = pipeline.stage('cubo', build_cube_workbooks, contents, profile, unit,
+                              params=(digests, 'planillas', profile, unit), shared=True)
+        return None, cube
+
+    content, digest = contents[0], digests[0]
+    if streaming:
+        cube = pipeline.stage('cubo', build_cube_streaming, iter_workbook_chunks(content), profile, unit,
+                              params=(digest, 'tandas', profile, unit), shared=True)
+        return None, cube
+
+    raw = pipeline.stage('lectura', read_raw, digest, content, params=(digest,), shared=True)
+    data = pipeline.stage('fechas', normalize_dates, raw, depends=('lectura',), shared=True)
+    if partitioned:
+        partitions = pipeline.stage('por_pais', build_partitioned, data, profile, unit, depends=('fechas',),
+                                    params=(profile, unit), shared=True)
+        kpi_table = pipeline.stage('tabla_kpi', operator.itemgetter(0), partitions, depends=('por_pais',), shared=True)
+    else:
+        kpi_table = pipeline.stage('tabla_kpi', build_results_df, data, unit, depends=('fechas',), params=(unit,), shared=True)
+    results_df = pipeline.stage('clasificacion', classify_results, kpi_table, profile, depends=('tabla_kpi',),
+                                params=(profile,), shared=True)
+    if partitioned:
+        cube = pipeline.stage('cubo', operator.itemgetter(1), partitions, depends=('por_pais',), shared=True)
+    else:
+        base = pipeline.stage('base_cubo', cube_base, data, None, unit, depends=('fechas',), params=(unit,), shared=True)
+        cube = pipeline.stage('cubo', aggregate_cube, base, profile, depends=('base_cubo',), params=(profile,), shared=True)
+    return results_df, cube
+
+# Cargador de planillas. Se pueden cargar varias (p. ej. una por año fiscal u
+# oficina) para analizarlas en conjunto. Las planillas quedan en la sesión: al
+# cambiar de página el cargador de la nueva página aparece vacío, pero se siguen
+# usando las ya cargadas (y sus etapas compartidas). Quitarlas del cargador las
+# olvida. En la sesión solo quedan los archivos subidos; las tablas calculadas
+# están en el caché compartido del proceso.
+def upload_workbooks():
+    st.file_uploader("Carga tus planillas Excel", type=["xlsx"], accept_multiple_files=True,
+                     key='planillas_cargadas', on_change=_keep_workbooks)
+    workbooks = st.session_state.get('planillas', [])
+    if workbooks and not st.session_state.get('planillas_cargadas'):
+        st.caption(f"Usando {', '.join(workbook.name for workbook in workbooks)}, cargadas en otra página.")
+    return workbooks
+
+# Guarda en la sesión las planillas del cargador (lista vacía si se quitaron)
+def _keep_workbooks():
+    st.session_state['planillas'] = list(st.session_state['planillas_cargadas'] or [])
+
+# Muestra en la barra lateral qué etapas se reutilizaron y cuáles se recalcularon en este rerun
+def show_pipeline_report(pipeline):
+    with st.sidebar.expander("Etapas del cálculo", expanded=False):
+        st.dataframe(pd.DataFrame(pipeline.report), hide_index=True)
+
+# Muestra la tabla larga de KPI y el botón para descargarla. El Excel se genera al
+# pedir la descarga, con las fechas formateadas como en la tabla original.
+def show_results(results_df):
+    st.write("Datos Procesados:")
+    st.dataframe(results_df, column_config=results_column_config)
+    st.download_button(
+        label="Descargar como Excel",
+        data=lazy_excel(results_df, transform=expand_results),
+        file_name='resultados_kpi_productividad.xlsx',
+        mime=xlsx_mime
+    )
+
+# Muestra en la barra lateral los bytes por fila de la tabla larga compacta y de su representación original
+def show_memory_report(report):
+    with st.sidebar.expander("Memoria de la tabla de KPI", expanded=False):
+        st.dataframe(report, hide_index=True)
+
+# Selector de la unidad de duración en la barra lateral (ver durations.duration_units).
+# La unidad elegida se conserva al cambiar de página.
+def select_duration_unit():
+    units = list(duration_units)
+    unit = st.sidebar.selectbox("Unidad de duración", units, index=units.index(st.session_state.get('unidad', units[0])),
+                                format_func=duration_units.get, key='unidad_duracion',
+                                help="Los días hábiles excluyen fines de semana y feriados nacionales de cada país.")
+    st.session_state['unidad'] = unit
+    return unit
+
+# Perfil de umbrales de la sesión: el último perfil válido editado en cualquier
+# página, o el del archivo de configuración
+def session_profile():
+    return st.session_state.get('perfil_umbrales') or load_profile()
+
+# Editor de umbrales de productividad en la barra lateral. Parte del perfil de la
+# sesión; cada fila es una regla (país y/o estación vacíos valen para todos).
+# Devuelve el perfil editado, o el último válido si la edición no lo es.
+def edit_profile():
+    profile = session_profile()
+    with st.sidebar.expander("Umbrales de productividad (meses)", expanded=False):
+        st.caption(f"Perfil cargado de {profile_path.name}. Se aplica la regla más específica de cada país y estación.")
+        table = st.data_editor(profile_table(profile), num_rows='dynamic', hide_index=True, key='umbrales', column_config={
+            'PAIS': st.column_config.TextColumn(),
+            'ESTACIONES': st.column_config.SelectboxColumn(options=[get_first_word(name) for name in operations])
+        })
+        try:
+            profile = profile_from_table(table)
+        except ValueError as error:
+            st.error(f"Umbrales no válidos, se usa el último perfil válido: {error}")
+            return profile
+    st.session_state['perfil_umbrales'] = profile
+    return profile
+
+
+# Activa el perfil de tiempos del rerun desde la barra lateral (o con la variable
+# de entorno TIEMPO_RESPUESTAS_PERFIL). Se llama al comienzo de cada página.
+def start_profile_panel():
+    enabled = st.sidebar.toggle("Perfil de tiempos", value=profile_enabled_by_env(), key='perfil')
+    start_profile(enabled)
+    return enabled
+
+# Muestra en la barra lateral el desglose de tiempos del rerun (tiempo, bloques de
+# memoria asignados y filas de entrada y salida de cada etapa medida) y, si se
+# pide, lo agrega al registro local. Se llama al final de cada página.
+def show_profile_panel(page):
+    records = profile_records()
+    if not records:
+        return
+    report = pd.DataFrame(records)
+    report['Etapa'] = ['  ' * level + name for level, name in zip(report.pop('Nivel'), report['Etapa'])]
+    with st.sidebar.expander("Perfil de tiempos", expanded=True):
+        st.dataframe(report, hide_index=True)
+        if st.checkbox(f"Guardar en {log_path.name}", value=profile_log_enabled_by_env(), key='perfil_registro'):
+            append_profile_log(page, records)
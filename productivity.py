@@ -0,0 +1,86 @@
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from kpi import calculate_productivity_array, productivity_labels, productivity_limits
+from profiling import profiled
+
+# Archivo con el perfil de umbrales de productividad
+profile_path = Path(os.environ.get('TIEMPO_RESPUESTAS_UMBRALES', Path(__file__).parent / 'productividad.json'))
+
+# Perfil por defecto: una sola regla con los límites de kpi.productivity_limits
+default_profile = ((None, None, productivity_limits),)
+
+# Columnas de la tabla editable de umbrales (una fila por regla)
+profile_columns = ['PAIS', 'ESTACIONES'] + [f'{label} hasta' for label in productivity_labels[:-1]]
+
+
+# Valida y normaliza una regla: país y estación (None = todos) y los límites, crecientes
+def _rule(country, station, limits):
+    limits = tuple(float(limit) for limit in limits)
+    if len(limits) != len(productivity_labels) - 1:
+        raise ValueError(f"Se esperaban {len(productivity_labels) - 1} límites y se recibieron {len(limits)}")
+    if any(np.isnan(limits)) or any(low >= high for low, high in zip(limits, limits[1:])):
+        raise ValueError(f"Los límites deben ser números crecientes: {list(limits)}")
+    country = None if pd.isna(country) or country == '' else str(country)
+    station = None if pd.isna(station) or station == '' else str(station)
+    return country, station, limits
+
+# Carga el perfil de umbrales desde el archivo de configuración. El perfil es una
+# tupla de reglas (país, estación, límites); None en país o estación vale para
+# todos. Si el archivo no existe se usa el perfil por defecto.
+def load_profile(path=profile_path):
+    try:
+        config = json.loads(Path(path).read_text(encoding='utf-8'))
+    except FileNotFoundError:
+        return default_profile
+    rules = tuple(_rule(rule.get('pais'), rule.get('estacion'), rule['limites']) for rule in config['umbrales'])
+    if not any(country is None and station is None for country, station, _ in rules):
+        rules += default_profile  # Siempre hay una regla general
+    return rules
+
+# Perfil como tabla para st.data_editor, y de vuelta
+def profile_table(profile):
+    return pd.DataFrame([(country, station, *limits) for country, station, limits in profile], columns=profile_columns)
+
+def profile_from_table(table):
+    rules = tuple(_rule(row[0], row[1], row[2:]) for row in table[profile_columns].itertuples(index=False)
+                  if not all(pd.isna(value) for value in row[2:]))
+    if not any(country is None and station is None for country, station, _ in rules):
+        rules += default_profile
+    return rules
+
+
+# Límites que corresponden a cada fila según su país y estación. Se resuelve una
+# vez por combinación distinta (país, estación), con esta precedencia: país y
+# estación, solo país, solo estación y la regla general; la última regla gana.
+def row_limits(profile, countries, stations):
+    if len(profile) == 1:
+        return np.asarray(profile[0][2], dtype='float64')  # Mismos límites para todas las filas
+    specific = {(country, station): limits for country, station, limits in profile}
+    country_codes, countries = pd.factorize(pd.Series(countries))
+    station_codes, stations = pd.factorize(pd.Series(stations))
+    # Código de cada combinación (país, estación); -1 (vacío) se resuelve como None
+    pairs, codes = np.unique((country_codes + 1) * (len(stations) + 1) + station_codes + 1, return_inverse=True)
+    countries = [None] + list(countries)
+    stations = [None] + list(stations)
+    table = np.array([
+        next(specific[key] for key in ((country, station), (country, None), (None, station), (None, None))
+             if key in specific)
+        for country, station in ((countries[pair // len(stations)], stations[pair % len(stations)]) for pair in pairs)
+    ], dtype='float64').reshape(-1, len(productivity_labels) - 1)
+    return table[codes.reshape(-1)]
+
+# Clasifica toda la columna de KPI en una sola pasada con los límites del perfil
+def classify(kpi, countries, stations, profile=default_profile):
+    return calculate_productivity_array(kpi, row_limits(profile, countries, stations))
+
+# Reclasifica la tabla larga de KPI con otro perfil, sin recalcular fechas ni KPI
+@profiled('clasificacion')
+def classify_results(results_df, profile=default_profile):
+    kpi = np.round(results_df['KPI'].to_numpy(dtype='float64'), 2)  # El KPI se guarda como float32
+    productivity = classify(kpi, results_df['PAIS'], results_df['ESTACIONES'], profile)
+    return results_df.assign(Productividad=pd.Categorical(productivity, dtype=results_df['Productividad'].dtype))
@@ -0,0 +1,102 @@
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from snapshot import cache_root
+
+# Variables de entorno: activar el perfil por defecto y guardar cada rerun en un registro
+profile_env = 'TIEMPO_RESPUESTAS_PERFIL'
+profile_log_env = 'TIEMPO_RESPUESTAS_PERFIL_LOG'
+
+# Registro local de tiempos (una línea JSON por rerun)
+log_path = Path(os.environ.get(profile_log_env) or cache_root / 'perfil.jsonl')
+
+# Estado del perfil del rerun en curso. Streamlit ejecuta cada rerun en el hilo
+# de la sesión, de modo que cada sesión acumula solo sus propias etapas.
+_state = threading.local()
+
+
+# Si el perfil está activado por variable de entorno
+def profile_enabled_by_env():
+    return os.environ.get(profile_env, '').lower() in ('1', 'true', 'si', 'sí')
+
+# Si se guarda el registro por variable de entorno
+def profile_log_enabled_by_env():
+    return bool(os.environ.get(profile_log_env))
+
+# Empieza el perfil de un rerun; con `enabled` falso las etapas no se miden
+def start_profile(enabled):
+    _state.records = [] if enabled else None
+    _state.depth = 0
+
+# Etapas medidas en el rerun en curso (lista vacía si el perfil está apagado)
+def profile_records():
+    return list(getattr(_state, 'records', None) or [])
+
+
+# Número de filas de un valor: DataFrame, Series o arreglo; en una tupla, el
+# primer elemento (p. ej. (tabla, cubo)). None si no es una tabla.
+def row_count(value):
+    if isinstance(value, tuple) and value:
+        value = value[0]
+    if isinstance(value, (pd.DataFrame, pd.Series, np.ndarray)):
+        return len(value)
+    return None
+
+# Mide una etapa: tiempo de reloj, bloques de memoria asignados (neto, con
+# sys.getallocatedblocks) y filas de entrada y salida. `info` es un diccionario
+# donde el bloque puede dejar 'filas_salida'. Las etapas anidadas guardan su nivel.
+@contextmanager
+def profile_stage(name, rows_in=None):
+    records = getattr(_state, 'records', None)
+    if records is None:
+        yield {}
+        return
+    record = {'Etapa': name, 'Nivel': _state.depth}
+    records.append(record)
+    info = {}
+    _state.depth += 1
+    blocks = sys.getallocatedblocks()
+    start = time.perf_counter()
+    try:
+        yield info
+    finally:
+        record['Tiempo (ms)'] = round((time.perf_counter() - start) * 1000, 1)
+        record['Bloques asignados'] = sys.getallocatedblocks() - blocks
+        record['Filas entrada'] = rows_in
+        record['Filas salida'] = info.get('filas_salida')
+        _state.depth -= 1
+
+# Decorador que mide cada llamada a la función como una etapa del perfil. Con el
+# perfil apagado solo agrega una consulta al estado del hilo.
+def profiled(name):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if getattr(_state, 'records', None) is None:
+                return func(*args, **kwargs)
+            with profile_stage(name, rows_in=row_count(args[0]) if args else None) as info:
+                result = func(*args, **kwargs)
+                info['filas_salida'] = row_count(result)
+            return result
+        return wrapper
+    return decorator
+
+
+# Agrega las etapas del rerun al registro local, como una línea JSON
+def append_profile_log(page, records, path=log_path):
+    if not records:
+        return
+    entry = {'fecha': datetime.now(timezone.utc).isoformat(timespec='seconds'), 'pagina': page, 'etapas': records}
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as log:
+        log.write(json.dumps(entry, ensure_ascii=False, default=str) + '\n')
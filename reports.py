@@ -0,0 +1,168 @@
+import numpy as np
+import pandas as pd
+
+from cube import (build_cube, cube_counts, cube_distinct, cube_group, cube_mean, cube_pivot_mean,
+                  cube_rows, measure_scale, slice_cube)
+from distributions import distribution_table, histogram_series
+from exports import excel_bytes
+from kpi import build_results_df, expand_results, productivity_labels
+from productivity import classify_results, default_profile
+from profiling import profiled
+
+# Reportes que se generan para cada planilla: nombre del archivo (sin extensión)
+# y si se exporta con el índice
+report_files = {
+    'resultados': ('resultados_kpi_productividad', False),
+    'kpi_por_pais': ('kpi_promedio_por_pais_y_año', False),
+    'alta_demora': ('resumen_alta_demora', True)
+}
+
+# Formatos en los que se pueden escribir los reportes
+report_formats = ['xlsx', 'parquet', 'csv']
+
+
+# Página de eficiencia por estaciones
+
+# Función para aplicar los filtros de año y estación sobre las celdas del cubo
+@profiled('filtro')
+def filter_cells(cube, selected_years, selected_station):
+    stations = None if selected_station == 'Todas' else [selected_station]
+    filtered_cells = slice_cube(cube, years=selected_years, stations=stations)
+    # Filtrar los datos insuficientes para las métricas y el gráfico de conteo de productividad
+    filtered_cube = slice_cube(filtered_cells, productivity=productivity_labels)
+    return filtered_cells, filtered_cube
+
+# Función para calcular las métricas y tablas que muestran los gráficos
+@profiled('agregados')
+def aggregate_efficiency(filtered_cells, filtered_cube):
+    # Preparación de datos para el gráfico de barras apiladas
+    kpi_by_year_country = cube_pivot_mean(filtered_cells, 'ANO', 'PAIS').fillna(0)
+    # Aseguramos que los años sean enteros y se muestren como tal en el eje X
+    kpi_by_year_country.index = kpi_by_year_country.index.map(int)
+
+    # Pivotear el cubo para obtener el KPI promedio por país y año, redondeado a dos decimales
+    kpi_pivot_df = cube_pivot_mean(filtered_cells, 'PAIS', 'ANO', decimals=2)
+    # Opción para reemplazar los valores None/NaN con un string vacío
+    kpi_pivot_df = kpi_pivot_df.fillna('')
+    # Convertir las etiquetas de las columnas a enteros (los años)
+    kpi_pivot_df.columns = kpi_pivot_df.columns.astype(int)
+    # Resetear el índice para llevar 'PAIS' a una columna
+    kpi_pivot_df.reset_index(inplace=True)
+
+    return {
+        'average_kpi': cube_mean(filtered_cube),
+        'unique_operation_count': cube_distinct(filtered_cube),  # Unión de las operaciones de cada celda
+        'total_stations': cube_rows(filtered_cube),  # Conteo total de estaciones (filas)
+        'kpi_avg_by_country': cube_group(filtered_cube, 'PAIS')['promedio'].sort_values(ascending=True),
+        'productivity_count': cube_counts(filtered_cube, 'Productividad').sort_values(),
+        'kpi_by_year_country': kpi_by_year_country,
+        'kpi_pivot_df': kpi_pivot_df
+    }
+
+
+# Dimensiones por las que se puede desglosar la distribución de los tiempos
+distribution_dimensions = {'ESTACIONES': "Estación", 'PAIS': "País", 'ANO': "Año"}
+
+# Función para calcular la distribución de los tiempos de las celdas filtradas:
+# percentiles de toda la selección y por grupo de `by`, y el histograma
+@profiled('distribucion')
+def aggregate_distribution(filtered_cube, by):
+    overall = distribution_table(filtered_cube, scale=measure_scale['kpi'])
+    table = distribution_table(filtered_cube, by, scale=measure_scale['kpi'])
+    if by == 'ANO':
+        table['ANO'] = table['ANO'].astype(int)
+    return {
+        'overall': overall.iloc[0],
+        'table': table.rename(columns={by: distribution_dimensions[by]}),
+        'histogram': histogram_series(filtered_cube, scale=measure_scale['kpi'])
+    }
+
+
+# Página de casos especiales (operaciones con alta y con demora)
+
+# Función para seleccionar las celdas del cubo con alta y con demora dentro del rango
+# de años y, si se selecciona un país específico, solo las de ese país
+@profiled('filtro')
+def filter_delayed(cube, selected_years, selected_country):
+    countries = None if selected_country == 'Todos' else [selected_country]
+    delayed_operations = slice_cube(cube, years=selected_years, countries=countries,
+                                    productivity=['Alta Demora', 'Con Demora'])
+    # Solo las operaciones con "Alta Demora", de todos los países
+    alta_demora_df = slice_cube(cube, years=selected_years, productivity=['Alta Demora'])
+    return delayed_operations, alta_demora_df
+
+# Función para calcular las métricas y tablas de las operaciones retrasadas
+@profiled('agregados')
+def aggregate_delayed(delayed_operations, alta_demora_df):
+    # Calculamos el KPI promedio por año y país para el gráfico de barras apiladas
+    kpi_by_year_country = cube_pivot_mean(delayed_operations, 'ANO', 'PAIS').fillna(0)
+    # Aseguramos que los años sean enteros y se muestren como tal en el eje X
+    kpi_by_year_country.index = kpi_by_year_country.index.astype(int)
+
+    # Crear el DataFrame pivotado con el KPI promedio por país y año, redondeado a dos decimales
+    summary_df = cube_pivot_mean(alta_demora_df, 'PAIS', 'ANO', decimals=2).fillna(0)
+    # Convertir el índice 'ANO' a enteros
+    summary_df.columns = summary_df.columns.astype(int)
+
+    return {
+        'average_kpi_delayed': cube_mean(delayed_operations),
+        'median_kpi_delayed': distribution_table(delayed_operations, scale=measure_scale['kpi'])['Mediana'].iloc[0],
+        'unique_operations_count_delayed': cube_distinct(delayed_operations),
+        'total_stations_delayed': cube_rows(delayed_operations),
+        'kpi_by_year_country': kpi_by_year_country,
+        'summary_df': summary_df
+    }
+
+
+# Calcula los tres reportes de las páginas para una planilla ya leída (con las
+# fechas normalizadas), sin filtros: todos los años, estaciones y países
+def build_reports(data, profile=default_profile, unit='dias30'):
+    results_df = classify_results(build_results_df(data, unit=unit), profile)
+    return {'resultados': results_df, **cube_reports(build_cube(data, profile=profile, unit=unit))}
+
+# Reportes resumidos (KPI por país y año y alta demora) a partir de un cubo, sin
+# filtros. Sirven también para el cubo combinado de varias planillas, que no
+# tiene tabla larga.
+def cube_reports(cube):
+    years = cube['ANO'].dropna()
+    year_range = (int(years.min()), int(years.max())) if len(years) else (0, 0)
+
+    efficiency = aggregate_efficiency(*filter_cells(cube, year_range, 'Todas'))
+    delayed = aggregate_delayed(*filter_delayed(cube, year_range, 'Todos'))
+    return {
+        'kpi_por_pais': efficiency['kpi_pivot_df'],
+        'alta_demora': delayed['summary_df']
+    }
+
+# Tabla con tipos que Parquet y CSV representan sin ambigüedad: nombres de
+# columna como texto y las celdas vacías ('') de las tablas resumidas como NaN
+def _plain_table(df, index):
+    table = df.reset_index() if index else df.copy()
+    table.columns = [str(column) for column in table.columns]
+    for column in table.columns[table.dtypes == object]:
+        if table[column].map(lambda value: value == '' or isinstance(value, (int, float))).all():
+            table[column] = pd.to_numeric(table[column].replace('', np.nan))
+    return table
+
+# Escribe los reportes en `directory` en cada uno de los formatos pedidos y
+# devuelve las rutas escritas. La tabla larga se escribe en Excel y CSV con su
+# representación original (fechas formateadas) y en Parquet con los tipos compactos.
+def write_reports(reports, directory, formats=report_formats):
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for name, df in reports.items():
+        file_name, index = report_files[name]
+        for fmt in formats:
+            path = directory / f'{file_name}.{fmt}'
+            if fmt == 'xlsx':
+                transform = expand_results if name == 'resultados' else None
+                path.write_bytes(excel_bytes(df, index=index, transform=transform))
+            elif fmt == 'parquet':
+                _plain_table(df, index).to_parquet(path, index=False)
+            elif fmt == 'csv':
+                table = expand_results(df) if name == 'resultados' else df
+                _plain_table(table, index).to_csv(path, index=False)
+            else:
+                raise ValueError(f"Formato de reporte desconocido: {fmt!r}")
+            paths.append(path)
+    return paths
@@ -0,0 +1,103 @@
+import hashlib
+import io
+import json
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
+
+import pandas as pd
+
+from profiling import profiled
+from snapshot import cache_root
+
+# Directorio donde se guarda la última copia válida de cada hoja publicada como CSV
+sheets_dir = cache_root / 'sheets'
+
+# Segundos durante los que una copia local se usa sin consultar al servidor
+sheet_ttl = 300
+
+# Segundos de espera por cada descarga
+request_timeout = 20
+
+# Estados posibles de una hoja luego de cargarla
+status_cache = 'caché'            # Copia local vigente, sin consultar al servidor
+status_revalidated = 'revalidada' # El servidor respondió 304: la copia local sigue siendo válida
+status_downloaded = 'descargada'  # El servidor envió contenido nuevo
+status_offline = 'sin conexión'   # No se pudo consultar al servidor: se usa la última copia válida
+
+
+# Rutas del contenido y de los metadatos (ETag, Last-Modified, hora de descarga) de una URL
+def _cache_paths(url):
+    key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+    return sheets_dir / f'{key}.csv', sheets_dir / f'{key}.json'
+
+def _read_cache(url):
+    body_path, meta_path = _cache_paths(url)
+    try:
+        return body_path.read_bytes(), json.loads(meta_path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None, None
+
+def _write_cache(url, body, meta):
+    body_path, meta_path = _cache_paths(url)
+    sheets_dir.mkdir(parents=True, exist_ok=True)
+    if body is not None:
+        body_path.write_bytes(body)
+    meta_path.write_text(json.dumps(meta), encoding='utf-8')
+
+
+# Obtiene el contenido de una hoja publicada como CSV, usando la copia local cuando es posible.
+# Dentro de `ttl` segundos se usa la copia local sin consultar al servidor; después
+# se revalida con If-None-Match / If-Modified-Since. Si el servidor no responde, o
+# con `offline`, se usa la última copia válida. Devuelve (bytes o None, estado, error).
+def fetch_csv(url, ttl=sheet_ttl, offline=False, timeout=request_timeout):
+    body, meta = _read_cache(url)
+    if body is not None and (offline or time.time() - meta['fetched_at'] < ttl):
+        return body, status_offline if offline else status_cache, None
+    if offline:
+        return None, status_offline, "No hay una copia local de la hoja"
+
+    request = urllib.request.Request(url)
+    if body is not None:
+        if meta.get('etag'):
+            request.add_header('If-None-Match', meta['etag'])
+        if meta.get('last_modified'):
+            request.add_header('If-Modified-Since', meta['last_modified'])
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            new_body = response.read()
+            new_meta = {
+                'url': url,
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified') or formatdate(usegmt=True),
+                'fetched_at': time.time()
+            }
+        _write_cache(url, new_body, new_meta)
+        return new_body, status_downloaded, None
+    except urllib.error.HTTPError as error:
+        if error.code == 304 and body is not None:
+            _write_cache(url, None, {**meta, 'fetched_at': time.time()})
+            return body, status_revalidated, None
+        failure = error
+    except (urllib.error.URLError, OSError) as error:
+        failure = error
+    return body, status_offline, str(failure)
+
+# Función para cargar una hoja como DataFrame. Devuelve (DataFrame o None, estado, error).
+def load_sheet(url, ttl=sheet_ttl, offline=False):
+    body, status, error = fetch_csv(url, ttl=ttl, offline=offline)
+    if body is None:
+        return None, status, error
+    try:
+        return pd.read_csv(io.BytesIO(body), header=0), status, error
+    except (ValueError, pd.errors.ParserError) as parse_error:
+        return None, status, str(parse_error)
+
+# Carga varias hojas a la vez, una por hilo, para que la espera total sea la de la más lenta.
+# Devuelve una lista de (DataFrame o None, estado, error) en el mismo orden que `urls`.
+@profiled('google_sheets')
+def load_sheets(urls, ttl=sheet_ttl, offline=False):
+    with ThreadPoolExecutor(max_workers=max(len(urls), 1)) as executor:
+        return list(executor.map(lambda url: load_sheet(url, ttl=ttl, offline=offline), urls))
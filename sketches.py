@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+# Precisión de los bosquejos HyperLogLog: 2**11 registros de un byte por celda,
+# con un error relativo típico de 1,04 / sqrt(2**11) ≈ 2,3 %
+sketch_precision = 11
+sketch_registers = 1 << sketch_precision
+
+# Bits del hash que se usan para el rango de cada valor (exactos en un float64)
+_rank_bits = 52
+
+# Hasta esta cantidad de códigos en la selección el conteo de distintos es exacto;
+# por encima se estima con la unión de los bosquejos de las celdas
+exact_limit = 250_000
+
+
+# Hash de 64 bits de cada valor (p. ej. el número de operación). Es el mismo en
+# cualquier proceso, así que los bosquejos de planillas distintas se pueden unir.
+def hash_values(values):
+    return pd.util.hash_array(np.asarray(values, dtype=object))
+
+# Bosquejos de varios grupos a la vez: fila g = registros del grupo g, a partir
+# del grupo de cada valor (`groups`, de 0 a n_groups - 1) y de su hash. Los bits
+# altos del hash eligen el registro; cada registro guarda el máximo de la
+# posición del primer bit en 1 de los bits bajos.
+def build_sketches(groups, hashes, n_groups):
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    registers = (hashes >> np.uint64(64 - sketch_precision)).astype(np.intp)
+    low = (hashes & np.uint64((1 << _rank_bits) - 1)).astype(np.float64)
+    ranks = (_rank_bits + 1 - np.frexp(low)[1]).astype(np.uint8)
+    sketches = np.zeros((n_groups, sketch_registers), dtype=np.uint8)
+    np.maximum.at(sketches, (np.asarray(groups, dtype=np.intp), registers), ranks)
+    return sketches
+
+# Unión de bosquejos: el máximo de cada registro
+def merge_sketches(sketches):
+    sketches = list(sketches)
+    if not sketches:
+        return np.zeros(sketch_registers, dtype=np.uint8)
+    return np.maximum.reduce(np.stack(sketches))
+
+# Estimación de HyperLogLog del número de valores distintos de un bosquejo, con
+# la corrección por conteo lineal para cardinalidades bajas
+def estimate_distinct(sketch):
+    m = sketch_registers
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / np.sum(np.ldexp(1.0, -sketch.astype(np.int64)))
+    zeros = int(np.count_nonzero(sketch == 0))
+    if estimate <= 2.5 * m and zeros:
+        estimate = m * np.log(m / zeros)
+    return estimate
+
+# Número de valores distintos en la unión de varias celdas. Si la selección tiene
+# pocos códigos (enteros densos desde 0) la unión es exacta, marcando cada código
+# en un arreglo de booleanos; si no, se estima con la unión de los bosquejos.
+def distinct_count(code_arrays, sketches, exact_limit=exact_limit):
+    code_arrays = list(code_arrays)
+    total = sum(len(codes) for codes in code_arrays)
+    if total == 0:
+        return 0
+    if total <= exact_limit:
+        codes = np.concatenate(code_arrays)
+        seen = np.zeros(int(codes.max()) + 1, dtype=bool)
+        seen[codes] = True
+        return int(np.count_nonzero(seen))
+    return int(round(estimate_distinct(merge_sketches(sketches))))
@@ -0,0 +1,153 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Versión del formato en disco; al cambiarla se ignoran las instantáneas anteriores
+# (y se borran al podar el directorio)
+snapshot_version = 2
+
+# Directorio local de cachés en disco (instantáneas, hojas descargadas, ...)
+cache_root = Path(os.environ.get('TIEMPO_RESPUESTAS_CACHE', Path(__file__).parent / '.cache'))
+
+# Directorio donde se guardan las instantáneas columnares de las planillas
+snapshot_dir = cache_root / 'snapshots'
+
+# Tamaño máximo del directorio de instantáneas; al superarlo se borran las
+# usadas hace más tiempo
+snapshot_max_bytes = int(os.environ.get('TIEMPO_RESPUESTAS_SNAPSHOTS_MB', 2048)) * 2**20
+
+# Antigüedad (segundos) a partir de la cual un directorio temporal de escritura
+# se considera abandonado (p. ej. por un proceso interrumpido)
+staging_max_age = 3600
+
+
+# Función para obtener el directorio de la instantánea de una planilla a partir de su huella
+def snapshot_path(digest):
+    return snapshot_dir / digest
+
+# Guarda la planilla como un directorio con un archivo .npy por columna y un meta.json.
+# Las fechas se guardan como datetime64, las columnas de texto (PAIS, APODO,
+# NO. OPERACION, ...) como códigos enteros más sus categorías, y el resto tal
+# cual. Las categorías de texto van en el meta.json; las de otro tipo (p. ej.
+# una columna object solo con números) en un .npy con su dtype, para que se
+# lean con el mismo tipo. Una columna que mezcla textos con otros tipos no se
+# puede guardar sin perder el tipo: ValueError, y la planilla se lee sin
+# instantánea. La escritura es atómica: se arma en un directorio temporal y
+# luego se renombra. Después se poda el directorio (ver prune_snapshots).
+def write_snapshot(digest, data):
+    target = snapshot_path(digest)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=f'.{digest}-', dir=target.parent))
+
+    columns = []
+    try:
+        for position, name in enumerate(data.columns):
+            series = data[name]
+            file_name = f'{position}.npy'
+            if pd.api.types.is_datetime64_any_dtype(series):
+                kind = 'datetime'
+                np.save(staging / file_name, series.to_numpy(dtype='datetime64[ns]'))
+                extra = {}
+            elif pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+                kind = 'numeric'
+                np.save(staging / file_name, series.to_numpy())
+                extra = {}
+            else:
+                kind = 'categorical'
+                codes, categories = pd.factorize(series.astype(object))
+                dtype = np.int16 if len(categories) < np.iinfo(np.int16).max else np.int32
+                np.save(staging / file_name, codes.astype(dtype))
+                extra = _save_categories(staging, position, name, categories)
+            columns.append({'name': str(name), 'file': file_name, 'kind': kind, **extra})
+
+        meta = {'version': snapshot_version, 'digest': digest, 'rows': len(data), 'columns': columns}
+        (staging / 'meta.json').write_text(json.dumps(meta, ensure_ascii=False), encoding='utf-8')
+
+        if target.exists():
+            shutil.rmtree(target)
+        os.replace(staging, target)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    prune_snapshots(keep=digest)
+    return target
+
+# Guarda las categorías de una columna de texto: en el meta.json si son todas
+# textos, o en un .npy con su dtype si son todas números, booleanos o fechas.
+# Devuelve las entradas de la columna para el meta.json.
+def _save_categories(staging, position, name, categories):
+    if all(isinstance(value, str) for value in categories):
+        return {'categories': list(categories)}
+    values = pd.Index(list(categories))
+    if not isinstance(values.dtype, np.dtype) or values.dtype.kind not in 'biufmM':
+        raise ValueError(f"La columna {name!r} mezcla textos con otros tipos; no se guarda la instantánea")
+    file_name = f'{position}.categories.npy'
+    np.save(staging / file_name, values.to_numpy())
+    return {'categories_file': file_name}
+
+# Carga una instantánea mapeando en memoria sus columnas. Devuelve None si no
+# existe o si no corresponde a la huella o a la versión del formato actual.
+def load_snapshot(digest):
+    target = snapshot_path(digest)
+    try:
+        meta = json.loads((target / 'meta.json').read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+    if meta.get('version') != snapshot_version or meta.get('digest') != digest:
+        return None
+
+    columns = {}
+    for column in meta['columns']:
+        values = np.load(target / column['file'], mmap_mode='r')
+        if column['kind'] == 'categorical':
+            if 'categories_file' in column:
+                categories = pd.Index(np.load(target / column['categories_file']))
+            else:
+                categories = column['categories']
+            values = pd.Categorical.from_codes(np.asarray(values), categories=categories)
+        columns[column['name']] = values
+    _touch(target)
+    return pd.DataFrame(columns, copy=False)
+
+# Marca una instantánea como usada ahora (la poda borra primero las usadas hace más tiempo)
+def _touch(target):
+    try:
+        os.utime(target / 'meta.json')
+    except OSError:
+        pass  # Caché de solo lectura: la poda usa la fecha de escritura
+
+# Poda el directorio de instantáneas: borra las de otra versión del formato y
+# los directorios temporales abandonados, y luego las usadas hace más tiempo
+# hasta que el total no supere `max_bytes`. La instantánea `keep` (la recién
+# escrita) no se borra aunque sola supere el límite.
+def prune_snapshots(keep=None, max_bytes=None):
+    max_bytes = snapshot_max_bytes if max_bytes is None else max_bytes
+    entries = []
+    for path in snapshot_dir.iterdir() if snapshot_dir.is_dir() else []:
+        try:
+            if path.name.startswith('.'):
+                if time.time() - path.stat().st_mtime > staging_max_age:
+                    shutil.rmtree(path, ignore_errors=True)
+                continue
+            meta_path = path / 'meta.json'
+            if json.loads(meta_path.read_text(encoding='utf-8')).get('version') != snapshot_version:
+                shutil.rmtree(path, ignore_errors=True)
+                continue
+            size = sum(file.stat().st_size for file in path.iterdir())
+            entries.append((meta_path.stat().st_mtime, path, size))
+        except (OSError, ValueError):
+            shutil.rmtree(path, ignore_errors=True)  # Instantánea incompleta o ilegible
+
+    total = sum(size for _, _, size in entries)
+    for _, path, size in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path.name != keep:
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
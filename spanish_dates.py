@@ -0,0 +1,69 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+# Meses en español por sus tres primeras letras
+spanish_months = {
+    'ene': 1, 'feb': 2, 'mar': 3, 'abr': 4, 'may': 5, 'jun': 6,
+    'jul': 7, 'ago': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dic': 12
+}
+
+# Formatos reconocidos, en orden de prioridad. Cada uno extrae día, mes (nombre) y año.
+date_patterns = [
+    # '15 ENE 14' (planilla de proyectos)
+    r'^(?P<day>\d{2}) (?P<month>[^\W\d_]{3}) (?P<year>\d{2})',
+    # '15-ago-14', '1-dic-17', '13-abr-20' o con año de cuatro cifras
+    r'^(?P<day>\d{1,2})-(?P<month>[^\W\d_]+)-(?P<year>\d{2}|\d{4})$',
+    # 'martes, 17 de noviembre de 2015'
+    r'^[^\W\d_]+, (?P<day>\d{1,2}) de (?P<month>[^\W\d_]+) de (?P<year>\d{4})$'
+]
+
+
+# Convierte los textos distintos a fechas con operaciones de texto sobre toda la
+# columna. Los que no siguen ninguno de los formatos ('17/11/2015', '2015-11-17')
+# se interpretan con pd.to_datetime, día primero.
+def _parse_unique(texts):
+    parts = pd.DataFrame(index=texts.index, columns=['day', 'month', 'year'], dtype=object)
+    pending = pd.Series(True, index=texts.index)
+    for pattern in date_patterns:
+        if not pending.any():
+            break
+        extracted = texts[pending].str.extract(pattern)
+        matched = extracted['day'].notna()
+        parts.loc[extracted.index[matched]] = extracted[matched].to_numpy()
+        pending[extracted.index[matched]] = False
+
+    year = pd.to_numeric(parts['year'], errors='coerce')
+    year = year.where(year >= 100, year + 2000)  # Años de dos cifras: '14' -> 2014
+    month = parts['month'].str.lower().str[:3].map(spanish_months)
+    day = pd.to_numeric(parts['day'], errors='coerce')
+    parsed = pd.to_datetime(pd.DataFrame({'year': year, 'month': month, 'day': day}), errors='coerce')
+    parsed = parsed.astype('datetime64[ns]')
+    if pending.any():
+        parsed[pending] = pd.to_datetime(texts[pending], dayfirst=True, format='mixed', errors='coerce')
+    return parsed
+
+# Convierte una columna de fechas escritas en español a datetime64 (NaT si no se reconoce).
+# Las celdas que ya son fechas (fechas reales de Excel en una columna con texto)
+# se conservan. Cada valor distinto se interpreta una sola vez y el resultado se
+# reparte a toda la columna.
+def parse_spanish_dates(values):
+    series = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+
+    codes, uniques = pd.factorize(series)
+    uniques = pd.Series(uniques, dtype=object)
+    is_date = uniques.map(lambda value: isinstance(value, (date, np.datetime64))).astype(bool)
+    parsed = pd.Series(pd.NaT, index=uniques.index, dtype='datetime64[ns]')
+    if is_date.any():
+        parsed[is_date] = pd.to_datetime(uniques[is_date].tolist(), errors='coerce')
+    if not is_date.all():
+        parsed[~is_date] = _parse_unique(uniques[~is_date].astype(str).str.strip())
+    parsed = parsed.to_numpy(dtype='datetime64[ns]')
+
+    result = np.full(len(codes), np.datetime64('NaT'), dtype='datetime64[ns]')
+    present = codes >= 0
+    result[present] = parsed[codes[present]]
+    return pd.Series(result, index=series.index, name=series.name)